@@ -0,0 +1,106 @@
+"""
+Sportág katalógus.
+
+A sportágak szinte soha nem változnak, ezért folyamatonként egyszer
+szerializáljuk őket, és az esemény payloadok, a sportág lista és a
+preferenciák ezt a kész dict-et használják újra. Minden SportType
+módosítás (és seed_sports futás) növeli a közös cache-ben tárolt
+katalógus verziót; a többi folyamat legfeljebb VERSION_CHECK_SECONDS
+késéssel észleli és újraépíti a saját példányát. A verzió a sportág
+lista ETag-jének alapja is. Az induló érték időbélyeg, így a cache
+ürítése után sem ismétlődhet egy korábbi verzió.
+"""
+import time
+import threading
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import SportType
+
+
+CATALOG_VERSION_KEY = 'sports:catalog-version'
+VERSION_CHECK_SECONDS = 5
+
+_lock = threading.Lock()
+_catalog = {
+    'version': None,
+    'checked_at': 0.0,
+    'by_id': {},
+    'ordered': [],
+}
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        return get_catalog_version()
+
+
+def invalidate_catalog():
+    """A helyi példány eldobása és a közös verzió növelése"""
+    with _lock:
+        _catalog['version'] = None
+    return bump_catalog_version()
+
+
+def _rebuild_local():
+    with _lock:
+        _catalog['version'] = None
+    _ensure_fresh()
+
+
+def _ensure_fresh():
+    now = time.monotonic()
+    if _catalog['version'] is not None and now - _catalog['checked_at'] < VERSION_CHECK_SECONDS:
+        return
+
+    version = get_catalog_version()
+    with _lock:
+        _catalog['checked_at'] = now
+        if version == _catalog['version']:
+            return
+
+        from .serializers import SportTypeSerializer
+        ordered = SportTypeSerializer(SportType.objects.order_by('name'), many=True).data
+        _catalog['ordered'] = [dict(item) for item in ordered]
+        _catalog['by_id'] = {item['id']: item for item in _catalog['ordered']}
+        _catalog['version'] = version
+
+
+def get_sport_types(active_only=True):
+    """Előre szerializált sportágak név szerint rendezve"""
+    _ensure_fresh()
+    if active_only:
+        return [item for item in _catalog['ordered'] if item['is_active']]
+    return list(_catalog['ordered'])
+
+
+def get_sport_type_data(sport_type_id):
+    """Egy sportág előre szerializált adata (None, ha nem létezik)"""
+    if sport_type_id is None:
+        return None
+    _ensure_fresh()
+    item = _catalog['by_id'].get(sport_type_id)
+    if item is None:
+        # az újonnan létrehozott sportág még nem látszik ebben a folyamatban:
+        # csak a helyi példány épül újra, a közös verzió nem változik, így
+        # egy ismeretlen id nem indít újraépítést a többi workerben
+        _rebuild_local()
+        item = _catalog['by_id'].get(sport_type_id)
+    return item
+
+
+@receiver(post_save, sender=SportType)
+@receiver(post_delete, sender=SportType)
+def invalidate_on_sport_type_change(sender, **kwargs):
+    transaction.on_commit(invalidate_catalog)
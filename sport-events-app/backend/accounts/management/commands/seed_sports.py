@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from accounts.models import SportType
+from accounts.catalog import invalidate_catalog
 
 
 class Command(BaseCommand):
@@ -60,6 +61,9 @@ class Command(BaseCommand):
                 skipped += 1
                 self.stdout.write(f"  - Már létezik: {sport['name']}")
 
+        # a futó folyamatok a következő verzió ellenőrzéskor újraépítik a katalógust
+        invalidate_catalog()
+
         self.stdout.write(self.style.SUCCESS(
             f'\nKész! {created} új sportág létrehozva, {skipped} már létezett.'
         ))
\ No newline at end of file
@@ -0,0 +1,78 @@
+# Opcionális PostGIS geography oszlop a User alapértelmezett helyéhez.
+# Csak akkor fut le, ha az adatbázis PostgreSQL és a postgis kiterjesztés
+# elérhető (pl. postgis/postgis docker image), egyébként nem csinál semmit.
+
+from django.db import migrations
+
+
+TABLE = 'accounts_user'
+POINT = "ST_SetSRID(ST_MakePoint({prefix}default_longitude::float8, {prefix}default_latitude::float8), 4326)::geography"
+
+
+def postgis_available(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'postgis'")
+        return cursor.fetchone() is not None
+
+
+def add_location_column(apps, schema_editor):
+    if not postgis_available(schema_editor):
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS postgis")
+    schema_editor.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS location geography(Point, 4326)")
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_location_gist ON {TABLE} USING GIST (location)")
+
+    # A default_latitude/default_longitude mezők maradnak az elsődleges adatok, a trigger tartja szinkronban a pontot
+    schema_editor.execute(f"""
+        CREATE OR REPLACE FUNCTION {TABLE}_sync_location() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.default_latitude IS NULL OR NEW.default_longitude IS NULL THEN
+                NEW.location := NULL;
+            ELSE
+                NEW.location := {POINT.format(prefix='NEW.')};
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_sync_location ON {TABLE}")
+    schema_editor.execute(f"""
+        CREATE TRIGGER {TABLE}_sync_location
+        BEFORE INSERT OR UPDATE OF default_latitude, default_longitude ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {TABLE}_sync_location()
+    """)
+
+
+def backfill_location(apps, schema_editor):
+    if not postgis_available(schema_editor):
+        return
+
+    schema_editor.execute(f"""
+        UPDATE {TABLE}
+        SET location = {POINT.format(prefix='')}
+        WHERE default_latitude IS NOT NULL AND default_longitude IS NOT NULL
+    """)
+
+
+def remove_location_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_sync_location ON {TABLE}")
+    schema_editor.execute(f"DROP FUNCTION IF EXISTS {TABLE}_sync_location()")
+    schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS location")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_location_column, remove_location_column),
+        migrations.RunPython(backfill_location, migrations.RunPython.noop),
+    ]
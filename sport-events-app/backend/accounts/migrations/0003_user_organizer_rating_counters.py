@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:39
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_organizer_ratings(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    EventParticipant = apps.get_model('events', 'EventParticipant')
+
+    rated = EventParticipant.objects.filter(
+        event__creator=OuterRef('pk'),
+        status='confirmed',
+        rating__isnull=False
+    ).order_by().values('event__creator')
+
+    User.objects.update(
+        organizer_rating_sum=Coalesce(Subquery(rated.annotate(total=Sum('rating')).values('total')), 0),
+        organizer_rating_count=Coalesce(Subquery(rated.annotate(total=Count('id')).values('total')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_location_geography'),
+        ('events', '0006_sportevent_occupancy_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='organizer_rating_count',
+            field=models.IntegerField(default=0, verbose_name='Szervezői értékelések száma'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='organizer_rating_sum',
+            field=models.IntegerField(default=0, verbose_name='Szervezői értékelések összege'),
+        ),
+        migrations.RunPython(backfill_organizer_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_organizer_rating_counters'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['default_latitude', 'default_longitude'], name='accounts_us_default_6af840_idx'),
+        ),
+    ]
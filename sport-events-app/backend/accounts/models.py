@@ -1,6 +1,14 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+
+# Keresési sugár (km): alapérték és felső korlát, az értesítések is ezt használják
+DEFAULT_SEARCH_RADIUS_KM = 10
+MAX_SEARCH_RADIUS_KM = 100
 
 
 class User(AbstractUser):
@@ -56,27 +64,85 @@ class User(AbstractUser):
     )
     
     default_search_radius = models.IntegerField(
-        default=10,
-        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        default=DEFAULT_SEARCH_RADIUS_KM,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_SEARCH_RADIUS_KM)],
         verbose_name="Alapértelmezett keresési sugár (km)",
         help_text="Hány km-es körzetben keressen eseményeket"
     )
     
+    # Szervezői értékelések összesítője, a résztvevők mentése tartja karban
+    organizer_rating_sum = models.IntegerField(
+        default=0,
+        verbose_name="Szervezői értékelések összege"
+    )
+    
+    organizer_rating_count = models.IntegerField(
+        default=0,
+        verbose_name="Szervezői értékelések száma"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Létrehozva")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Frissítve")
     
+    # Csak atomi F() UPDATE-tel vagy kifejezett update_fields-szel írt oszlopok
+    MAINTAINED_FIELDS = ('organizer_rating_sum', 'organizer_rating_count')
+    # A listákba ágyazott rövid profil (UserSummarySerializer) saját mezői
+    SUMMARY_FIELDS = ('username', 'first_name', 'last_name', 'profile_picture')
+    
     class Meta:
         verbose_name = "Felhasználó"
         verbose_name_plural = "Felhasználók"
         ordering = ['-date_joined']
+        indexes = [
+            models.Index(fields=['default_latitude', 'default_longitude']),
+        ]
     
     def __str__(self):
         return self.username
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(cls.SUMMARY_FIELDS) <= set(field_names):
+            instance._saved_summary = instance.summary_values()
+        return instance
+    
+    def summary_values(self):
+        return tuple(getattr(self, name) for name in self.SUMMARY_FIELDS)
+    
+    def summary_changed(self, update_fields=None):
+        """Változott-e a rövid profil a betöltés (vagy az utolsó mentés) óta"""
+        if update_fields is not None and not set(update_fields) & set(self.SUMMARY_FIELDS):
+            return False
+        saved = getattr(self, '_saved_summary', None)
+        return saved is None or saved != self.summary_values()
+    
+    def save(self, *args, **kwargs):
+        """
+        Meglévő felhasználó teljes mentése az értékelés számlálók nélkül, így
+        egy korábban betöltött példány (profil szerkesztés, jelszócsere)
+        nem írja felül az időközben érkezett értékeléseket
+        """
+        if kwargs.get('update_fields') is None and not self._state.adding and not kwargs.get('force_insert'):
+            skipped = set(self.MAINTAINED_FIELDS) | self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in skipped and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+        self._saved_summary = self.summary_values()
+    
     @property
     def full_name(self):
         """Teljes név visszaadása"""
         return f"{self.last_name} {self.first_name}".strip() or self.username
+    
+    @property
+    def organizer_rating(self):
+        """Szervezett eseményeinek átlagos értékelése"""
+        if self.organizer_rating_count:
+            return round(self.organizer_rating_sum / self.organizer_rating_count, 1)
+        return None
 
 
 class SportType(models.Model):
@@ -167,3 +233,10 @@ class UserSportPreference(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.sport_type.name} ({self.skill_level})"
+
+
+@receiver(post_save, sender=UserSportPreference)
+@receiver(post_delete, sender=UserSportPreference)
+def touch_user_preferences(sender, instance, **kwargs):
+    """A preferenciák a profil része: a felhasználó updated_at-je is frissül (ETag)"""
+    User.objects.filter(pk=instance.user_id).update(updated_at=timezone.now())
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
 from .models import User, SportType, UserSportPreference
-from events.models import EventParticipant
+from .catalog import get_sport_type_data
 
 
 class SportTypeSerializer(serializers.ModelSerializer):
@@ -14,11 +14,25 @@ class SportTypeSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class CatalogSportTypeField(serializers.Field):
+    """
+    Sportág adat a folyamatszintű katalógusból: nincs JOIN és nincs
+    sportágankénti újraszerializálás, az idegen kulcs elég hozzá.
+    """
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'sport_type_id')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return get_sport_type_data(value)
+
+
 class UserSportPreferenceSerializer(serializers.ModelSerializer):
     """
     Felhasználói sportág preferencia serializer
     """
-    sport_type_detail = SportTypeSerializer(source='sport_type', read_only=True)
+    sport_type_detail = CatalogSportTypeField()
     
     class Meta:
         model = UserSportPreference
@@ -39,7 +53,7 @@ class UserSerializer(serializers.ModelSerializer):
     Felhasználó serializer (alap adatok)
     """
     full_name = serializers.ReadOnlyField()
-    organizer_rating = serializers.SerializerMethodField()
+    organizer_rating = serializers.ReadOnlyField()
     sport_preferences = UserSportPreferenceSerializer(many=True, read_only=True)
     
     class Meta:
@@ -66,16 +80,28 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'date_joined', 'created_at', 'updated_at', 'full_name']
 
-    def get_organizer_rating(self, obj):
-        ratings = EventParticipant.objects.filter(
-            event__creator=obj,
-            status='confirmed',
-            rating__isnull=False
-        ).values_list('rating', flat=True)
-        
-        if ratings:
-            return round(sum(ratings) / len(ratings), 1)
-        return None
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """
+    Rövid, publikus felhasználó adatok listákba ágyazáshoz (szervező,
+    résztvevők), extra lekérdezés nélkül. A teljes profil a
+    /api/users/<id>/ végponton érhető el.
+    """
+    full_name = serializers.ReadOnlyField()
+    organizer_rating = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = User
+        fields = [
+            'id',
+            'username',
+            'first_name',
+            'last_name',
+            'full_name',
+            'profile_picture',
+            'organizer_rating'
+        ]
+        read_only_fields = fields
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -194,7 +220,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
     sport_preferences = UserSportPreferenceSerializer(many=True, read_only=True)
     created_events_count = serializers.SerializerMethodField()
     participated_events_count = serializers.SerializerMethodField()
-    organizer_rating = serializers.SerializerMethodField()
+    organizer_rating = serializers.ReadOnlyField()
     
     class Meta:
         model = User
@@ -238,14 +264,3 @@ class UserProfileSerializer(serializers.ModelSerializer):
     def get_participated_events_count(self, obj):
         """Részvett események száma"""
         return obj.event_participations.filter(status__in=['pending', 'confirmed']).count()
-    
-    def get_organizer_rating(self, obj):
-        ratings = EventParticipant.objects.filter(
-            event__creator=obj,
-            status='confirmed',
-            rating__isnull=False
-        ).values_list('rating', flat=True)
-        
-        if ratings:
-            return round(sum(ratings) / len(ratings), 1)
-        return None
@@ -7,7 +7,10 @@ from django.contrib.auth import authenticate
 from django.conf import settings
 from google import genai
 import json
+from sport_events_backend.conditional import ConditionalGetMixin, make_etag
 from .models import User, SportType, UserSportPreference
+from events.response_cache import get_events_version, upcoming_counts_by_sport
+from .catalog import get_catalog_version, get_sport_types
 from .serializers import (
     UserSerializer,
     UserRegistrationSerializer,
@@ -141,14 +144,42 @@ class UserDetailView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
 
-class SportTypeListView(generics.ListAPIView):
+class SportTypeListView(ConditionalGetMixin, generics.ListAPIView):
     """
     Sportágak listázása
     GET /api/sport-types/
+    
+    A lista a folyamatszintű katalógusból jön, adatbázis lekérdezés nélkül.
+    ?with_counts=true esetén minden sportág mellé upcoming_events_count
+    kerül a cache-elt összesítőből. GET feltételes: az ETag a katalógus
+    verzióból (számokkal együtt az events versionből is) számolódik.
     """
     queryset = SportType.objects.filter(is_active=True)
     serializer_class = SportTypeSerializer
     permission_classes = [AllowAny]
+    
+    def with_counts(self):
+        return self.request.query_params.get('with_counts', '').lower() in ('1', 'true', 'yes')
+    
+    def get_validators(self, request, *args, **kwargs):
+        events_version = get_events_version() if self.with_counts() else None
+        return make_etag(
+            'sports', get_catalog_version(), events_version, self.representation_key(request)
+        ), None
+    
+    def list(self, request, *args, **kwargs):
+        sport_types = get_sport_types()
+        if self.with_counts():
+            counts = upcoming_counts_by_sport()
+            sport_types = [
+                {**item, 'upcoming_events_count': counts.get(item['id'], 0)}
+                for item in sport_types
+            ]
+        
+        page = self.paginate_queryset(sport_types)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(sport_types)
 
 
 class UserSportPreferenceListCreateView(generics.ListCreateAPIView):
@@ -179,16 +210,23 @@ class UserSportPreferenceDetailView(generics.RetrieveUpdateDestroyAPIView):
         return UserSportPreference.objects.filter(user=self.request.user)
 
 
-class CurrentUserView(APIView):
+class CurrentUserView(ConditionalGetMixin, generics.RetrieveAPIView):
     """
     Aktuális bejelentkezett felhasználó adatai
     GET /api/users/me/
+    
+    GET feltételes: az ETag és a Last-Modified a felhasználó updated_at
+    mezőjéből jön (a preferencia és értékelés változások is frissítik).
     """
+    serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
     
-    def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+    def get_validators(self, request, *args, **kwargs):
+        user = request.user
+        return make_etag('me', user.pk, user.updated_at, self.representation_key(request)), user.updated_at
+    
+    def get_object(self):
+        return self.request.user
 
 
 class SportPreferenceBulkUpdateView(APIView):
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils import timezone
 from .models import SportEvent, EventParticipant, EventImage
+from .response_cache import bump_events_version
 
 
 class EventImageInline(admin.TabularInline):
@@ -73,7 +74,7 @@ class SportEventAdmin(admin.ModelAdmin):
             'fields': ('location_name', 'location_address', 'latitude', 'longitude')
         }),
         ('Résztvevők', {
-            'fields': ('max_participants', 'min_participants')
+            'fields': ('max_participants', 'min_participants', 'confirmed_count', 'confirmed_guests')
         }),
         ('Beállítások', {
             'fields': ('difficulty', 'is_public', 'requires_approval', 'is_free', 'price')
@@ -88,15 +89,18 @@ class SportEventAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'confirmed_count', 'confirmed_guests']
     
     inlines = [EventParticipantInline, EventImageInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_occupancy()
+    
     def get_participants_count(self, obj):
         """Résztvevők száma / maximum"""
-        confirmed = obj.participants.filter(status='confirmed').count()
-        return f"{confirmed} / {obj.max_participants}"
+        return f"{obj.participants_count} / {obj.max_participants}"
     get_participants_count.short_description = 'Résztvevők'
+    get_participants_count.admin_order_field = 'occupancy_count'
     
     def is_full_display(self, obj):
         """Betelt-e jelző"""
@@ -108,18 +112,21 @@ class SportEventAdmin(admin.ModelAdmin):
             '<span style="color: green;">✗ Van hely</span>'
         )
     is_full_display.short_description = 'Betelt?'
+    is_full_display.admin_order_field = 'occupancy_is_full'
     
     actions = ['mark_as_completed', 'mark_as_cancelled']
     
     def mark_as_completed(self, request, queryset):
         """Események befejezettnek jelölése"""
         updated = queryset.update(status='completed')
+        bump_events_version()
         self.message_user(request, f'{updated} esemény befejezettnek jelölve.')
     mark_as_completed.short_description = 'Kiválasztottak befejezettnek jelölése'
     
     def mark_as_cancelled(self, request, queryset):
         """Események törlése"""
         updated = queryset.update(status='cancelled')
+        bump_events_version()
         self.message_user(request, f'{updated} esemény törölve.')
     mark_as_cancelled.short_description = 'Kiválasztottak törlése'
 
@@ -183,13 +190,25 @@ class EventParticipantAdmin(admin.ModelAdmin):
     
     def confirm_participants(self, request, queryset):
         """Résztvevők megerősítése"""
+        event_ids = set(queryset.values_list('event_id', flat=True))
         updated = queryset.update(status='confirmed', confirmed_at=timezone.now())
+        SportEvent.refresh_occupancy(event_ids)
+        bump_events_version()
+        EventParticipant.refresh_organizer_ratings(
+            SportEvent.objects.filter(pk__in=event_ids).values('creator_id')
+        )
         self.message_user(request, f'{updated} résztvevő megerősítve.')
     confirm_participants.short_description = 'Kiválasztottak megerősítése'
     
     def cancel_participants(self, request, queryset):
         """Résztvevők lemondása"""
+        event_ids = set(queryset.values_list('event_id', flat=True))
         updated = queryset.update(status='cancelled')
+        SportEvent.refresh_occupancy(event_ids)
+        bump_events_version()
+        EventParticipant.refresh_organizer_ratings(
+            SportEvent.objects.filter(pk__in=event_ids).values('creator_id')
+        )
         self.message_user(request, f'{updated} résztvevő lemondva.')
     cancel_participants.short_description = 'Kiválasztottak lemondása'
 
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        # A válasz cache és az ajánlás cache signal kezelőinek regisztrálása
+        from . import response_cache  # noqa: F401
+        from . import recommendation_cache  # noqa: F401
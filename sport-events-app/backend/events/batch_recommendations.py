@@ -0,0 +1,225 @@
+"""
+Ajánlások kötegelt, előre számolása minden felhasználónak.
+
+Ugyanazt a pontszámot adja, mint a recommendation_service.get_recommended_events,
+de felhasználó x esemény blokkokban, NumPy tömbökön:
+
+  pont = érdeklődés + szint egyezés + előzmény + távolság pont + teltség pont
+
+Az események és a felhasználók jellemzői egyszer töltődnek be (néhány
+aggregált lekérdezés), a blokkok pontozása tiszta NumPy, így folyamatokra
+szétosztható. A score_block függvény nem használ Django-t.
+"""
+from collections import defaultdict
+import numpy as np
+from django.db.models import Count, Q, F
+from django.utils import timezone
+from accounts.models import User, UserSportPreference
+from .geo import haversine_km
+from .models import SportEvent, EventParticipant
+
+
+SKILL_LEVELS = {'beginner': 0, 'intermediate': 1, 'advanced': 2}
+DIFFICULTY_LEVELS = {'easy': 0, 'medium': 1, 'hard': 2}
+DEFAULT_RADIUS_KM = 50
+
+# Egy blokkban legfeljebb ennyi felhasználó x esemény cella (float64 mátrixok)
+BLOCK_CELLS = 2_000_000
+
+
+def load_event_features(now=None):
+    """
+    A jelölt események (közelgő, nyilvános, nem betelt) tömbjei a lista
+    sorrendjében (kezdés, id): ids, sport, difficulty, lat/lng radiánban
+    (hiányzó koordinátánál NaN) és teltségi arány
+    """
+    now = now or timezone.now()
+    rows = list(SportEvent.objects.filter(
+        status='upcoming',
+        is_public=True,
+        start_date_time__gte=now,
+        confirmed_count__lt=F('max_participants'),
+    ).order_by('start_date_time', 'id').values_list(
+        'id', 'sport_type_id', 'difficulty', 'latitude', 'longitude', 'confirmed_count', 'max_participants'
+    ))
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    fill = np.array([
+        row[5] / row[6] if row[6] > 0 else 0.0 for row in rows
+    ], dtype=np.float64)
+    return {
+        'ids': ids,
+        'sport': np.array([row[1] for row in rows], dtype=np.int64),
+        'difficulty': np.array([DIFFICULTY_LEVELS.get(row[2], 1) for row in rows], dtype=np.int8),
+        'lat': np.radians(np.array([np.nan if row[3] is None else float(row[3]) for row in rows], dtype=np.float64)),
+        'lng': np.radians(np.array([np.nan if row[4] is None else float(row[4]) for row in rows], dtype=np.float64)),
+        'fill_bonus': np.where(fill >= 0.8, 2.0, np.where(fill >= 0.5, 1.0, 0.0)),
+        'has_capacity': np.array([row[6] > 0 for row in rows], dtype=bool),
+    }
+
+
+def load_history_scores(user_ids=None):
+    """
+    get_participation_history_scores minden felhasználóra egyetlen
+    aggregált lekérdezésből: {user_id: {sport_type_id: score}}
+    """
+    confirmed = Q(status='confirmed')
+    participations = EventParticipant.objects.all()
+    if user_ids is not None:
+        participations = participations.filter(user_id__in=user_ids)
+
+    rows = participations.values('user_id', 'event__sport_type_id').annotate(
+        confirmed=Count('id', filter=confirmed),
+        rated=Count('id', filter=confirmed & Q(rating__isnull=False)),
+        high=Count('id', filter=confirmed & Q(rating__gte=4)),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+    ).filter(Q(confirmed__gt=0) | Q(cancelled__gt=0)).order_by()
+
+    history = defaultdict(dict)
+    for row in rows:
+        score = 3.0 * row['confirmed'] + 2.0 * row['rated'] + 1.0 * row['high'] - 1.0 * row['cancelled']
+        count = row['confirmed'] or 1
+        history[row['user_id']][row['event__sport_type_id']] = min(score / count + min(count * 0.5, 3.0), 10.0)
+    return history
+
+
+def load_user_features(user_ids, sport_index, event_index):
+    """
+    Egy felhasználó csoport tömbjei a sportág (sport_index: {sport_id: oszlop})
+    és esemény (event_index: {event_id: oszlop}) indexeléssel:
+    érdeklődés / szint / előzmény mátrix, releváns sportágak maszkja,
+    otthoni hely, sugár és a már jelentkezett események
+    """
+    n_users, n_sports = len(user_ids), len(sport_index)
+    row_of = {user_id: i for i, user_id in enumerate(user_ids)}
+
+    interest = np.zeros((n_users, n_sports), dtype=np.float64)
+    skill = np.full((n_users, n_sports), -1, dtype=np.int8)
+    history = np.zeros((n_users, n_sports), dtype=np.float64)
+    relevant = np.zeros((n_users, n_sports), dtype=bool)
+    has_any_sport = np.zeros(n_users, dtype=bool)
+
+    for user_id, sport_id, interest_level, skill_level in UserSportPreference.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'sport_type_id', 'interest_level', 'skill_level'):
+        i = row_of[user_id]
+        has_any_sport[i] = True
+        column = sport_index.get(sport_id)
+        if column is not None:
+            interest[i, column] = interest_level
+            skill[i, column] = SKILL_LEVELS.get(skill_level, 1)
+            relevant[i, column] = True
+
+    for user_id, scores in load_history_scores(user_ids).items():
+        i = row_of[user_id]
+        has_any_sport[i] = True
+        for sport_id, score in scores.items():
+            column = sport_index.get(sport_id)
+            if column is not None:
+                history[i, column] = score
+                relevant[i, column] = True
+
+    lat = np.full(n_users, np.nan)
+    lng = np.full(n_users, np.nan)
+    radius = np.full(n_users, float(DEFAULT_RADIUS_KM))
+    for user_id, user_lat, user_lng, user_radius in User.objects.filter(
+        pk__in=user_ids
+    ).values_list('id', 'default_latitude', 'default_longitude', 'default_search_radius'):
+        i = row_of[user_id]
+        # a get_recommended_events is csak nem nulla koordinátákat vesz helyadatnak
+        if user_lat and user_lng:
+            lat[i], lng[i] = np.radians(float(user_lat)), np.radians(float(user_lng))
+        radius[i] = float(user_radius or DEFAULT_RADIUS_KM)
+
+    joined = [[] for _ in user_ids]
+    for user_id, event_id in EventParticipant.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'event_id'):
+        column = event_index.get(event_id)
+        if column is not None:
+            joined[row_of[user_id]].append(column)
+
+    return {
+        'ids': np.asarray(user_ids, dtype=np.int64),
+        'interest': interest,
+        'skill': skill,
+        'history': history,
+        'relevant': relevant,
+        'has_any_sport': has_any_sport,
+        'lat': lat,
+        'lng': lng,
+        'radius': radius,
+        'joined': joined,
+    }
+
+
+def score_block(events, users, top_n):
+    """
+    Egy felhasználó blokk pontozása az összes jelölt eseményre.
+    events: load_event_features eredménye, 'sport_column' kiegészítéssel.
+    Visszatér: [(user_id, [(event_id, score, distance), ...]), ...]
+    """
+    n_users = len(users['ids'])
+    n_events = len(events['ids'])
+    if n_events == 0:
+        return [(int(user_id), []) for user_id in users['ids']]
+
+    sport_column = events['sport_column']
+    rows = np.arange(n_users)[:, np.newaxis]
+
+    # ugyanabban a sorrendben összeadva, mint a get_recommended_events
+    score = np.zeros((n_users, n_events), dtype=np.float64)
+    score += users['interest'][rows, sport_column]
+
+    skill = users['skill'][rows, sport_column]
+    level_diff = np.abs(skill - events['difficulty'][np.newaxis, :])
+    score += np.where(skill < 0, 0.0, np.where(level_diff == 0, 3.0, np.where(level_diff == 1, 1.0, 0.0)))
+
+    score += users['history'][rows, sport_column]
+
+    has_location = ~np.isnan(users['lat'])
+    distance = haversine_km(
+        users['lat'][:, np.newaxis], users['lng'][:, np.newaxis],
+        events['lat'][np.newaxis, :], events['lng'][np.newaxis, :]
+    )
+    radius = users['radius'][:, np.newaxis]
+    score += np.where(has_location[:, np.newaxis], np.maximum(0.0, 5.0 * (1 - distance / radius)), 0.0)
+
+    score += np.where(events['has_capacity'], events['fill_bonus'], 0.0)[np.newaxis, :]
+    score = np.round(score, 2)
+
+    eligible = users['relevant'][rows, sport_column]
+    eligible &= ~has_location[:, np.newaxis] | (distance <= radius)
+    for i, columns in enumerate(users['joined']):
+        if columns:
+            eligible[i, columns] = False
+
+    results = []
+    for i in range(n_users):
+        user_id = int(users['ids'][i])
+
+        if not users['has_any_sport'][i]:
+            # preferencia és előzmény nélkül: az első közelgő események, pontszám nélkül
+            results.append((user_id, [(int(event_id), 0, None) for event_id in events['ids'][:top_n]]))
+            continue
+
+        candidates = np.flatnonzero(eligible[i])
+        if len(candidates) > top_n:
+            # a top_n-edik pontszám feletti és azzal egyenlők, hogy a stabil rendezés ugyanazt adja
+            threshold = np.partition(score[i, candidates], len(candidates) - top_n)[len(candidates) - top_n]
+            candidates = candidates[score[i, candidates] >= threshold]
+        order = candidates[np.argsort(-score[i, candidates], kind='stable')][:top_n]
+
+        results.append((user_id, [
+            (
+                int(events['ids'][j]),
+                float(score[i, j]),
+                round(float(distance[i, j]), 1) if has_location[i] else None,
+            )
+            for j in order
+        ]))
+    return results
+
+
+def block_size(n_events):
+    return max(1, BLOCK_CELLS // max(n_events, 1))
@@ -0,0 +1,142 @@
+"""
+Térképes klaszterezés zoom szintenként.
+
+A világot zoom szintenként 2^zoom x 2^zoom egyforma (fokban mért) csempére
+osztjuk, minden csempét CELLS_PER_TILE x CELLS_PER_TILE cellára. Egy cella
+eseményei egy klasztert adnak (súlypont, darabszám, sportág bontás).
+A csempék eredménye külön-külön cache-elve van, így egy térkép mozgatás
+csak a még nem látott csempéket számolja ki, egyetlen GROUP BY lekérdezéssel.
+A kulcsok az "events version" számlálót is tartalmazzák, így bármely
+esemény módosítás után a csempék újraszámolódnak.
+"""
+from math import floor
+from collections import defaultdict
+from django.core.cache import cache
+from django.db.models import Count, Sum, FloatField, Value
+from django.db.models.functions import Cast, Floor
+from .response_cache import get_events_version
+
+
+MAX_ZOOM = 20
+CELLS_PER_TILE = 4
+MAX_TILES = 64
+TILE_CACHE_TIMEOUT = 60
+
+
+def parse_bbox(value):
+    """
+    'min_lng,min_lat,max_lng,max_lat' -> tuple, hibás érték esetén ValueError
+    """
+    parts = [float(part) for part in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError("A bbox négy koordinátából áll.")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng <= max_lng <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise ValueError("Érvénytelen bbox.")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def tile_size(zoom):
+    return 360.0 / (2 ** zoom)
+
+
+def tiles_for_bbox(bbox, zoom):
+    """A bbox-ot lefedő csempék (x, y) indexei, legfeljebb MAX_TILES darab"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    size = tile_size(zoom)
+    last = 2 ** zoom - 1
+    x_from = min(floor((min_lng + 180) / size), last)
+    x_to = min(floor((max_lng + 180) / size), last)
+    y_from = min(floor((min_lat + 90) / size), last)
+    y_to = min(floor((max_lat + 90) / size), last)
+    if (x_to - x_from + 1) * (y_to - y_from + 1) > MAX_TILES:
+        raise ValueError("Túl nagy terület ehhez a zoom szinthez.")
+    return [
+        (x, y)
+        for x in range(x_from, x_to + 1)
+        for y in range(y_from, y_to + 1)
+    ]
+
+
+def _tile_cache_key(version, zoom, tile, filters_key):
+    return f'event-clusters:{version}:{zoom}:{tile[0]}:{tile[1]}:{filters_key}'
+
+
+def _compute_tiles(queryset, zoom, tiles):
+    """
+    A megadott csempék klaszterei egyetlen lekérdezéssel:
+    {(x, y): [cluster, ...]}
+    """
+    size = tile_size(zoom)
+    cell = size / CELLS_PER_TILE
+
+    x_from = min(x for x, _ in tiles)
+    x_to = max(x for x, _ in tiles)
+    y_from = min(y for _, y in tiles)
+    y_to = max(y for _, y in tiles)
+
+    lat = Cast('latitude', FloatField())
+    lng = Cast('longitude', FloatField())
+
+    # a 180. hosszúsági kör az utolsó csempéhez tartozik, nem egy nem létező következőhöz
+    last_tile = 2 ** zoom - 1
+    last_cell = (last_tile + 1) * CELLS_PER_TILE - 1
+    lng_to = {'longitude__lt': (x_to + 1) * size - 180} if x_to < last_tile else {'longitude__lte': 180}
+
+    rows = queryset.filter(
+        longitude__gte=x_from * size - 180,
+        latitude__gte=y_from * size - 90,
+        latitude__lt=(y_to + 1) * size - 90,
+        **lng_to
+    ).annotate(
+        cell_x=Floor((lng + Value(180.0)) / Value(cell)),
+        cell_y=Floor((lat + Value(90.0)) / Value(cell)),
+    ).values('cell_x', 'cell_y', 'sport_type_id').annotate(
+        count=Count('id'),
+        lat_sum=Sum(lat),
+        lng_sum=Sum(lng),
+    ).order_by()
+
+    cells = {}
+    for row in rows:
+        key = (min(int(row['cell_x']), last_cell), int(row['cell_y']))
+        entry = cells.setdefault(key, {'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0, 'sport_types': {}})
+        entry['count'] += row['count']
+        entry['lat_sum'] += row['lat_sum']
+        entry['lng_sum'] += row['lng_sum']
+        entry['sport_types'][str(row['sport_type_id'])] = row['count']
+
+    result = defaultdict(list)
+    for (cell_x, cell_y), entry in cells.items():
+        tile = (cell_x // CELLS_PER_TILE, cell_y // CELLS_PER_TILE)
+        result[tile].append({
+            'latitude': round(entry['lat_sum'] / entry['count'], 6),
+            'longitude': round(entry['lng_sum'] / entry['count'], 6),
+            'count': entry['count'],
+            'sport_types': entry['sport_types'],
+        })
+    return result
+
+
+def get_clusters(queryset, bbox, zoom, filters_key=''):
+    """
+    Klaszterek a bbox-ot lefedő csempékből. A hiányzó csempéket
+    egy lekérdezésben számolja, és csempénként cache-eli.
+    """
+    tiles = tiles_for_bbox(bbox, zoom)
+
+    version = get_events_version()
+    keys = {tile: _tile_cache_key(version, zoom, tile, filters_key) for tile in tiles}
+    cached = cache.get_many(list(keys.values()))
+
+    missing = [tile for tile in tiles if keys[tile] not in cached]
+    if missing:
+        computed = _compute_tiles(queryset, zoom, missing)
+        fresh = {keys[tile]: computed.get(tile, []) for tile in missing}
+        cache.set_many(fresh, TILE_CACHE_TIMEOUT)
+        cached.update(fresh)
+
+    clusters = []
+    for tile in tiles:
+        clusters.extend(cached[keys[tile]])
+    return clusters
@@ -0,0 +1,171 @@
+from math import radians, degrees, sin, cos, asin
+import numpy as np
+from django.db import connection
+from django.db.models import FloatField, BooleanField, Value, ExpressionWrapper
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Radians, Sin, Cos, ASin, Sqrt, Power, Least
+
+
+EARTH_RADIUS_KM = 6371
+
+# Opcionális PostGIS backend: a migrációk csak akkor hozzák létre a
+# geography 'location' oszlopot (GiST indexszel), ha a postgis kiterjesztés
+# elérhető - egyébként minden a latitude/longitude mezőkkel működik tovább.
+GEOGRAPHY_COLUMN = 'location'
+POINT_SQL = 'ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography'
+
+_geography_columns = {}
+
+
+def _to_radians(values):
+    """Decimal/float/None értékek -> float64 radián tömb (None -> NaN)"""
+    return np.radians(np.asarray(
+        [np.nan if value is None else float(value) for value in np.ravel(values)],
+        dtype=np.float64
+    ).reshape(np.shape(values)))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Közös kernel radiánban megadott, egymásra broadcastolható tömbökre
+    (a kötegelt ajánlás a már radiánban tárolt tömbjeivel közvetlenül hívja)
+    """
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_many(lat, lng, lats, lngs):
+    """
+    Egy kiinduló pont távolsága (km) N ponttól egyetlen hívásban.
+    Visszatér: N hosszú float64 tömb, hiányzó koordinátánál NaN.
+    """
+    return haversine_km(
+        np.radians(float(lat)), np.radians(float(lng)),
+        _to_radians(lats), _to_radians(lngs)
+    )
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Egy pont körüli kör befoglaló téglalapja fokokban.
+
+    Visszatér: (min_lat, max_lat, min_lng, max_lng). A hosszúsági határok
+    None értékűek, ha a kör tartalmazza valamelyik pólust vagy átlépi a
+    180. hosszúsági kört - ilyenkor csak szélesség szerint szűrhetünk.
+    """
+    angular = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - degrees(angular)
+    max_lat = lat + degrees(angular)
+
+    if min_lat <= -90 or max_lat >= 90 or sin(angular) >= cos(radians(lat)):
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    delta_lng = degrees(asin(sin(angular) / cos(radians(lat))))
+    min_lng = lng - delta_lng
+    max_lng = lng + delta_lng
+
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def distance_expression(lat, lng, lat_field='latitude', lng_field='longitude'):
+    """
+    Haversine távolság (km) adatbázis kifejezésként egy fix ponttól.
+    Annotációként használható, így a szűrés és rendezés SQL-ben történik.
+    """
+    lat1 = radians(lat)
+    lng1 = radians(lng)
+
+    lat2 = Radians(Cast(lat_field, FloatField()))
+    lng2 = Radians(Cast(lng_field, FloatField()))
+
+    half_dlat = (lat2 - Value(lat1)) / Value(2.0)
+    half_dlng = (lng2 - Value(lng1)) / Value(2.0)
+
+    a = Power(Sin(half_dlat), 2) + Value(cos(lat1)) * Cos(lat2) * Power(Sin(half_dlng), 2)
+
+    return ExpressionWrapper(
+        Value(2.0 * EARTH_RADIUS_KM) * ASin(Least(Sqrt(a), Value(1.0))),
+        output_field=FloatField()
+    )
+
+
+def has_geography_column(model):
+    """
+    Van-e PostGIS geography oszlopa a model táblájának.
+    Folyamatonként egyszer kérdezi le, SQLite-on mindig False.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    table = model._meta.db_table
+    if table not in _geography_columns:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = %s AND udt_name = 'geography'",
+                [table, GEOGRAPHY_COLUMN]
+            )
+            _geography_columns[table] = cursor.fetchone() is not None
+    return _geography_columns[table]
+
+
+def _geography_sql(model):
+    return f'"{model._meta.db_table}"."{GEOGRAPHY_COLUMN}"'
+
+
+def postgis_within(queryset, lat, lng, radius_km, radius_sql=None):
+    """
+    ST_DWithin szűrés a GiST indexen. A 'distance' (km) mellett
+    'knn_distance' annotációt is ad, ami a <-> operátorral indexből rendezhető.
+    Ha radius_sql meg van adva (soronkénti sugár km-ben, pl. oszlop),
+    a radius_km csak az indexelhető előszűrés felső korlátja.
+    """
+    column = _geography_sql(queryset.model)
+    point = (lng, lat)
+
+    queryset = queryset.filter(RawSQL(
+        f'ST_DWithin({column}, {POINT_SQL}, %s, false)',
+        point + (radius_km * 1000,),
+        output_field=BooleanField()
+    ))
+    if radius_sql:
+        queryset = queryset.filter(RawSQL(
+            f'ST_DWithin({column}, {POINT_SQL}, ({radius_sql}) * 1000, false)',
+            point,
+            output_field=BooleanField()
+        ))
+
+    return queryset.annotate(
+        distance=RawSQL(f'ST_Distance({column}, {POINT_SQL}, false) / 1000.0', point, output_field=FloatField()),
+        knn_distance=RawSQL(f'{column} <-> {POINT_SQL}', point, output_field=FloatField()),
+    )
+
+
+def filter_within_radius(queryset, lat, lng, radius_km, lat_field='latitude', lng_field='longitude'):
+    """
+    Sugár alapú szűrés egyetlen lekérdezésben: befoglaló téglalap előszűrés
+    (a (latitude, longitude) indexet használja), majd pontos gömbi távolság
+    ellenőrzés. A távolság 'distance' annotációként kerül a sorokra.
+    PostGIS esetén ST_DWithin-t használ a geography oszlopon.
+    """
+    if lat_field == 'latitude' and has_geography_column(queryset.model):
+        return postgis_within(queryset, lat, lng, radius_km)
+
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+    queryset = queryset.filter(**{
+        f'{lat_field}__gte': min_lat,
+        f'{lat_field}__lte': max_lat,
+    })
+    if min_lng is not None:
+        queryset = queryset.filter(**{
+            f'{lng_field}__gte': min_lng,
+            f'{lng_field}__lte': max_lng,
+        })
+
+    return queryset.annotate(
+        distance=distance_expression(lat, lng, lat_field, lng_field)
+    ).filter(distance__lte=radius_km)
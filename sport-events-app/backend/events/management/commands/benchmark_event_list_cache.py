@@ -0,0 +1,52 @@
+import time
+from statistics import median
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from events.response_cache import bump_events_version, cache_stats, reset_cache_stats
+from events.views import SportEventListCreateView
+
+
+class Command(BaseCommand):
+    help = 'Az esemény lista válasz cache mérése: cache nélküli és cache-elt kiszolgálás összevetése'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Kérések száma módonként')
+        parser.add_argument('--lat', type=float, default=47.497913, help='Kiinduló szélesség (alap: Budapest)')
+        parser.add_argument('--lng', type=float, default=19.040236, help='Kiinduló hosszúság')
+        parser.add_argument('--radius', type=float, default=10, help='Sugár (km)')
+
+    def handle(self, *args, **options):
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost')
+        factory = RequestFactory(HTTP_HOST=host)
+        view = SportEventListCreateView.as_view()
+        queries = [
+            {},
+            {'status': 'upcoming'},
+            {'user_lat': options['lat'], 'user_lng': options['lng'], 'radius': options['radius']},
+        ]
+
+        def serve(params):
+            started = time.perf_counter()
+            response = view(factory.get('/api/events/', params))
+            response.render()
+            return time.perf_counter() - started
+
+        reset_cache_stats()
+        uncached = []
+        for i in range(options['requests']):
+            # minden kérés előtt új verzió -> mindig tévesztés
+            bump_events_version()
+            uncached.append(serve(queries[i % len(queries)]))
+
+        bump_events_version()
+        cached = [serve(queries[i % len(queries)]) for i in range(options['requests'])]
+
+        for label, timings in (('cache nélkül', uncached), ('cache-elve', cached)):
+            self.stdout.write(
+                f'{label}: medián {median(timings) * 1000:.2f} ms, '
+                f'átlag {sum(timings) / len(timings) * 1000:.2f} ms, '
+                f'{len(timings) / sum(timings):.0f} kérés/s'
+            )
+        self.stdout.write(f'Gyorsulás (medián): {median(uncached) / median(cached):.1f}x')
+        self.stdout.write(f'Statisztika: {cache_stats()}')
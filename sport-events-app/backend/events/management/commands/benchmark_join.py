@@ -0,0 +1,98 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from accounts.models import User, SportType
+from events.models import SportEvent, EventParticipant
+from events.participation_service import join_event, JoinRejected
+
+
+class Command(BaseCommand):
+    help = (
+        'Párhuzamos jelentkezések egy eseményre: áteresztőképesség mérése és '
+        'annak ellenőrzése, hogy a létszámkorlát nem léphető túl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Jelentkezők száma')
+        parser.add_argument('--capacity', type=int, default=20, help='Az esemény maximális létszáma')
+        parser.add_argument('--workers', type=int, default=16, help='Párhuzamos szálak száma')
+        parser.add_argument('--guests', type=int, default=0, help='Plusz vendégek jelentkezésenként')
+        parser.add_argument('--keep', action='store_true', help='Ne törölje a létrehozott adatokat')
+
+    def handle(self, *args, **options):
+        if options['capacity'] < 2:
+            raise CommandError('A létszám legalább 2 kell legyen.')
+
+        prefix = f'join-bench-{int(time.time())}'
+        try:
+            self.run(prefix, options)
+        finally:
+            if not options['keep']:
+                # az esemény védi a sportágat, ezért előbb az események
+                SportEvent.objects.filter(title=prefix).delete()
+                User.objects.filter(username__startswith=prefix).delete()
+                SportType.objects.filter(name=prefix).delete()
+
+    def run(self, prefix, options):
+        creator = User.objects.create_user(username=f'{prefix}-creator')
+        # saját, inaktív sportág: nem jelenik meg a nyilvános katalógusban
+        sport_type = SportType.objects.create(name=prefix, is_active=False)
+        event = SportEvent.objects.create(
+            title=prefix,
+            description='Párhuzamos jelentkezés benchmark',
+            sport_type=sport_type,
+            creator=creator,
+            start_date_time=timezone.now() + timedelta(days=1),
+            location_name='Benchmark',
+            latitude=47.497913,
+            longitude=19.040236,
+            max_participants=options['capacity'],
+        )
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-{i}') for i in range(options['users'])
+        ])
+
+        def attempt(user):
+            started = time.perf_counter()
+            try:
+                join_event(event.pk, user, extra_guests=options['guests'])
+                outcome = 'joined'
+            except JoinRejected:
+                outcome = 'rejected'
+            except Exception as exc:
+                outcome = f'error: {exc.__class__.__name__}'
+            finally:
+                connection.close()
+            return outcome, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(attempt, users))
+        elapsed = time.perf_counter() - started
+
+        outcomes = {}
+        for outcome, _ in results:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        latencies = sorted(duration for _, duration in results)
+
+        event.refresh_from_db()
+        actual = EventParticipant.objects.filter(event=event, status='confirmed').count()
+
+        self.stdout.write(f'Backend: {connection.vendor}, {options["workers"]} szál')
+        self.stdout.write(f'Jelentkezések: {len(results)} db {elapsed:.3f} s alatt '
+                          f'({len(results) / elapsed:.1f} kérés/s)')
+        self.stdout.write(f'Késleltetés: medián {latencies[len(latencies) // 2] * 1000:.1f} ms, '
+                          f'max {latencies[-1] * 1000:.1f} ms')
+        for outcome, count in sorted(outcomes.items()):
+            self.stdout.write(f'  {outcome}: {count}')
+        self.stdout.write(f'Létszám: {event.participants_count} / {event.max_participants} '
+                          f'(számláló: {event.confirmed_count}, tényleges: {actual})')
+
+        if event.participants_count > event.max_participants:
+            raise CommandError('Túlfoglalás: a létszám meghaladja a maximumot!')
+        if event.confirmed_count != actual:
+            raise CommandError('A számláló eltér a tényleges résztvevőszámtól!')
+        self.stdout.write(self.style.SUCCESS('Nincs túlfoglalás, a számlálók egyeznek.'))
@@ -0,0 +1,110 @@
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from django.core.management.base import BaseCommand
+from django.db import transaction, connections
+from django.utils import timezone
+from accounts.models import User
+from events.models import UserRecommendation
+from events.batch_recommendations import (
+    load_event_features,
+    load_user_features,
+    score_block,
+    block_size,
+)
+
+
+_events = None
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+
+
+def _score(users, top_n):
+    return score_block(_events, users, top_n)
+
+
+class Command(BaseCommand):
+    help = (
+        'Ajánlások előre számolása minden aktív felhasználónak NumPy blokkokban, '
+        'folyamatokra szétosztva; az eredmény a UserRecommendation táblába kerül'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=50, help='Felhasználónként tárolt ajánlások száma')
+        parser.add_argument('--workers', type=int, default=0, help='Folyamatok száma (0: egy folyamatban)')
+        parser.add_argument('--batch-size', type=int, default=0, help='Felhasználók blokkonként (0: az eseményszámból)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        computed_at = timezone.now()
+        top_n = options['top']
+
+        events = load_event_features(computed_at)
+        sport_index = {sport_id: i for i, sport_id in enumerate(sorted(set(events['sport'].tolist())))}
+        event_index = {event_id: i for i, event_id in enumerate(events['ids'].tolist())}
+        events['sport_column'] = np.array([sport_index[sport_id] for sport_id in events['sport'].tolist()], dtype=np.int64)
+
+        user_ids = list(User.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True))
+        size = options['batch_size'] or block_size(len(event_index))
+        blocks = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+        self.stdout.write(f'{len(event_index)} jelölt esemény, {len(user_ids)} felhasználó, {len(blocks)} blokk')
+
+        def user_blocks():
+            for block in blocks:
+                yield load_user_features(block, sport_index, event_index)
+
+        stored = 0
+        if options['workers'] > 0:
+            # a gyerek folyamatok ne örököljék a nyitott adatbázis kapcsolatot
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                initializer=_init_worker,
+                initargs=(events,)
+            ) as pool:
+                # folyamatonként legfeljebb két blokk van úton, így a betöltött
+                # jellemzők nem halmozódnak fel a felhasználók számával
+                pending = set()
+                for users in user_blocks():
+                    pending.add(pool.submit(_score, users, top_n))
+                    if len(pending) >= 2 * options['workers']:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            stored += self.store(future.result(), computed_at)
+                for future in pending:
+                    stored += self.store(future.result(), computed_at)
+        else:
+            _init_worker(events)
+            for users in user_blocks():
+                stored += self.store(_score(users, top_n), computed_at)
+
+        # a most nem számolt felhasználók (inaktívvá váltak, törlődtek) régi sorai
+        purged, _ = UserRecommendation.objects.filter(computed_at__lt=computed_at).delete()
+        if purged:
+            self.stdout.write(f'{purged} elavult ajánlás törölve')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{stored} ajánlás mentve {len(user_ids)} felhasználónak, '
+            f'{time.perf_counter() - started:.1f} s alatt.'
+        ))
+
+    def store(self, results, computed_at):
+        rows = [
+            UserRecommendation(
+                user_id=user_id,
+                event_id=event_id,
+                rank=rank,
+                score=score,
+                distance=distance,
+                computed_at=computed_at,
+            )
+            for user_id, ranking in results
+            for rank, (event_id, score, distance) in enumerate(ranking)
+        ]
+        with transaction.atomic():
+            UserRecommendation.objects.filter(user_id__in=[user_id for user_id, _ in results]).delete()
+            UserRecommendation.objects.bulk_create(rows, batch_size=5000)
+        return len(rows)
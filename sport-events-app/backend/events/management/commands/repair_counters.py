@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import Coalesce
+from accounts.models import User
+from events.models import SportEvent, EventParticipant
+from events.response_cache import bump_events_version
+
+
+class Command(BaseCommand):
+    help = 'A denormalizált számlálók (létszám, szervezői értékelés) ellenőrzése és javítása'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Csak kiírja az eltéréseket, nem javít'
+        )
+
+    def handle(self, *args, **options):
+        self.repair_occupancy(options['dry_run'])
+        self.repair_organizer_ratings(options['dry_run'])
+
+    def repair_occupancy(self, dry_run):
+        confirmed = Q(participants__status='confirmed')
+        drifted = list(SportEvent.objects.annotate(
+            actual_count=Count('participants', filter=confirmed),
+            actual_guests=Coalesce(Sum('participants__extra_guests', filter=confirmed), 0),
+        ).exclude(
+            confirmed_count=F('actual_count'),
+            confirmed_guests=F('actual_guests'),
+        ).values_list('id', 'confirmed_count', 'actual_count', 'confirmed_guests', 'actual_guests'))
+
+        for event_id, stored_count, actual_count, stored_guests, actual_guests in drifted:
+            self.stdout.write(
+                f'Esemény #{event_id}: résztvevők {stored_count} -> {actual_count}, '
+                f'vendégek {stored_guests} -> {actual_guests}'
+            )
+
+        self._finish(drifted, dry_run, 'esemény létszám', SportEvent.refresh_occupancy)
+
+    def repair_organizer_ratings(self, dry_run):
+        rated = Q(created_events__participants__status='confirmed',
+                  created_events__participants__rating__isnull=False)
+        drifted = list(User.objects.annotate(
+            actual_sum=Coalesce(Sum('created_events__participants__rating', filter=rated), 0),
+            actual_count=Count('created_events__participants', filter=rated),
+        ).exclude(
+            organizer_rating_sum=F('actual_sum'),
+            organizer_rating_count=F('actual_count'),
+        ).values_list('id', 'organizer_rating_sum', 'actual_sum', 'organizer_rating_count', 'actual_count'))
+
+        for user_id, stored_sum, actual_sum, stored_count, actual_count in drifted:
+            self.stdout.write(
+                f'Felhasználó #{user_id}: értékelés összeg {stored_sum} -> {actual_sum}, '
+                f'darab {stored_count} -> {actual_count}'
+            )
+
+        self._finish(drifted, dry_run, 'szervezői értékelés', EventParticipant.refresh_organizer_ratings)
+
+    def _finish(self, drifted, dry_run, label, refresh):
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'Nincs eltérés ({label}).'))
+            return
+
+        if dry_run:
+            self.stdout.write(f'{len(drifted)} eltérés ({label}, dry-run).')
+            return
+
+        updated = refresh([row[0] for row in drifted])
+        bump_events_version()
+        self.stdout.write(self.style.SUCCESS(f'{updated} számláló javítva ({label}).'))
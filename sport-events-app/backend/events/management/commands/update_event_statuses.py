@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from events.models import SportEvent
+from events.response_cache import bump_events_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Esemény státuszok léptetése (upcoming -> ongoing -> completed) tömeges UPDATE-ekkel. '
+        'Cronból percenként, vagy --interval megadásával folyamatosan futtatható.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Ismétlés ennyi másodpercenként (0: egyszeri futás)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Csak kiírja az esedékes váltások számát, nem módosít'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        if options['dry_run']:
+            self.report_due()
+            return
+
+        while True:
+            self.advance()
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    def advance(self):
+        started, completed = SportEvent.advance_statuses()
+        if started or completed:
+            bump_events_version()
+        self.stdout.write(
+            f'{timezone.localtime():%Y-%m-%d %H:%M:%S} '
+            f'elkezdődött: {started}, befejeződött: {completed}'
+        )
+
+    def report_due(self):
+        now = timezone.now()
+        due = SportEvent.objects.filter(status__in=['upcoming', 'ongoing'])
+        completed = due.filter(effective_end_time__lte=now).count()
+        started = due.filter(status='upcoming', start_date_time__lte=now, effective_end_time__gt=now).count()
+        self.stdout.write(f'Esedékes: elkezdődik {started}, befejeződik {completed} (dry-run).')
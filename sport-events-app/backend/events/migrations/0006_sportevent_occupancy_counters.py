@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:34
+
+from django.db import migrations, models
+from django.db.models import Count, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_occupancy(apps, schema_editor):
+    SportEvent = apps.get_model('events', 'SportEvent')
+    EventParticipant = apps.get_model('events', 'EventParticipant')
+
+    confirmed = EventParticipant.objects.filter(
+        event=OuterRef('pk'),
+        status='confirmed'
+    ).order_by().values('event')
+
+    SportEvent.objects.update(
+        confirmed_count=Coalesce(Subquery(confirmed.annotate(total=Count('id')).values('total')), 0),
+        confirmed_guests=Coalesce(Subquery(confirmed.annotate(total=Sum('extra_guests')).values('total')), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_sportevent_location_geography'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sportevent',
+            name='confirmed_count',
+            field=models.IntegerField(default=0, help_text='Megerősített jelentkezések száma', verbose_name='Megerősített résztvevők'),
+        ),
+        migrations.AddField(
+            model_name='sportevent',
+            name='confirmed_guests',
+            field=models.IntegerField(default=0, help_text='A megerősített résztvevők plusz vendégeinek összege', verbose_name='Megerősített vendégek'),
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
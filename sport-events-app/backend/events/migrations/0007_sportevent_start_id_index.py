@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_sportevent_occupancy_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sportevent',
+            index=models.Index(fields=['start_date_time', 'id'], name='events_spor_start_d_0ba368_idx'),
+        ),
+    ]
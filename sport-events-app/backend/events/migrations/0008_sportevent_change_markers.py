@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_sportevent_start_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sportevent',
+            name='images_changed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Képek utolsó változása'),
+        ),
+        migrations.AddField(
+            model_name='sportevent',
+            name='participants_changed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Résztvevők utolsó változása'),
+        ),
+    ]
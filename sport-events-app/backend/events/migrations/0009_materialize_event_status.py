@@ -0,0 +1,45 @@
+from datetime import timedelta
+from django.db import migrations
+from django.db.models import F, Value, ExpressionWrapper, DateTimeField, DurationField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def materialize_status(apps, schema_editor):
+    """A meglévő események státuszának beállítása az időpontjaik alapján"""
+    SportEvent = apps.get_model('events', 'SportEvent')
+    now = timezone.now()
+    end_boundary = Coalesce(
+        F('end_date_time'),
+        ExpressionWrapper(
+            F('start_date_time') + ExpressionWrapper(
+                F('duration_minutes') * Value(timedelta(minutes=1)),
+                output_field=DurationField()
+            ),
+            output_field=DateTimeField()
+        ),
+        ExpressionWrapper(
+            F('start_date_time') + Value(timedelta(hours=3)),
+            output_field=DateTimeField()
+        ),
+        output_field=DateTimeField()
+    )
+    SportEvent.objects.annotate(end_boundary=end_boundary).filter(
+        status__in=['upcoming', 'ongoing'],
+        end_boundary__lte=now
+    ).update(status='completed')
+    SportEvent.objects.filter(
+        status='upcoming',
+        start_date_time__lte=now
+    ).update(status='ongoing')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_sportevent_change_markers'),
+    ]
+
+    operations = [
+        migrations.RunPython(materialize_status, migrations.RunPython.noop),
+    ]
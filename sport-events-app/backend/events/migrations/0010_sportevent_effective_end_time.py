@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:51
+
+from datetime import timedelta
+from django.db import migrations, models
+from django.db.models import F, Value, ExpressionWrapper, DateTimeField, DurationField
+from django.db.models.functions import Coalesce, NullIf
+
+
+def backfill_effective_end_time(apps, schema_editor):
+    """end_date_time, ennek hiányában kezdés + időtartam, végül kezdés + 3 óra"""
+    SportEvent = apps.get_model('events', 'SportEvent')
+    # a nulla időtartam hiányzónak számít, mint a compute_effective_end_time-ban
+    SportEvent.objects.update(effective_end_time=Coalesce(
+        F('end_date_time'),
+        ExpressionWrapper(
+            F('start_date_time') + ExpressionWrapper(
+                NullIf(F('duration_minutes'), Value(0)) * Value(timedelta(minutes=1)),
+                output_field=DurationField()
+            ),
+            output_field=DateTimeField()
+        ),
+        ExpressionWrapper(
+            F('start_date_time') + Value(timedelta(hours=3)),
+            output_field=DateTimeField()
+        ),
+        output_field=DateTimeField()
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_materialize_event_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sportevent',
+            name='effective_end_time',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Tényleges befejezés'),
+        ),
+        migrations.RunPython(backfill_effective_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='sportevent',
+            name='effective_end_time',
+            field=models.DateTimeField(editable=False, verbose_name='Tényleges befejezés'),
+        ),
+        migrations.AddIndex(
+            model_name='sportevent',
+            index=models.Index(fields=['is_public', 'effective_end_time', 'start_date_time'], name='events_spor_is_publ_91e668_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Opcionális teljes szöveges keresés a SportEvent-hez: súlyozott tsvector
+# oszlop GIN indexszel, triggerrel szinkronban tartva. Csak PostgreSQL-en
+# fut le, más adatbázison a keresés az ILIKE alapú SearchFilter marad.
+
+from django.db import migrations
+
+
+TABLE = 'events_sportevent'
+CONFIG = 'sportevents_hu'
+VECTOR = (
+    "setweight(to_tsvector('{config}', coalesce({prefix}title, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce({prefix}location_name, '') || ' ' || coalesce({prefix}location_address, '')), 'B') || "
+    "setweight(to_tsvector('{config}', coalesce({prefix}description, '')), 'C')"
+)
+
+
+def unaccent_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'unaccent'")
+        return cursor.fetchone() is not None
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    # Magyar szótőképzés, ékezet-független egyezéssel, ha lehet
+    config = 'hungarian'
+    if unaccent_available(schema_editor):
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        schema_editor.execute(f"""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIG}') THEN
+                    CREATE TEXT SEARCH CONFIGURATION {CONFIG} (COPY = hungarian);
+                    ALTER TEXT SEARCH CONFIGURATION {CONFIG}
+                        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, hungarian_stem;
+                END IF;
+            END
+            $$
+        """)
+        config = CONFIG
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+    schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_search_gin ON {TABLE} USING GIN (search_vector)")
+
+    schema_editor.execute(f"""
+        CREATE OR REPLACE FUNCTION {TABLE}_sync_search() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {VECTOR.format(config=config, prefix='NEW.')};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_sync_search ON {TABLE}")
+    schema_editor.execute(f"""
+        CREATE TRIGGER {TABLE}_sync_search
+        BEFORE INSERT OR UPDATE OF title, description, location_name, location_address ON {TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {TABLE}_sync_search()
+    """)
+
+    schema_editor.execute(f"UPDATE {TABLE} SET search_vector = {VECTOR.format(config=config, prefix='')}")
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_sync_search ON {TABLE}")
+    schema_editor.execute(f"DROP FUNCTION IF EXISTS {TABLE}_sync_search()")
+    schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+    schema_editor.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {CONFIG}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_sportevent_effective_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
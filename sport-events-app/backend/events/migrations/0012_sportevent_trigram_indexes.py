@@ -0,0 +1,47 @@
+# Opcionális pg_trgm GIN indexek a helyszín és cím javaslatokhoz.
+# Csak PostgreSQL-en, elérhető pg_trgm kiterjesztés mellett fut le,
+# egyébként a javaslatok prefix/részszöveg egyezéssel működnek.
+
+from django.db import migrations
+
+
+TABLE = 'events_sportevent'
+COLUMNS = ('location_name', 'title')
+
+
+def trigram_available(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def add_trigram_indexes(apps, schema_editor):
+    if not trigram_available(schema_editor):
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in COLUMNS:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_{column}_trgm ON {TABLE} USING GIN ({column} gin_trgm_ops)"
+        )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for column in COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TABLE}_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_sportevent_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 06:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_sportevent_trigram_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Helyezés')),
+                ('score', models.FloatField(verbose_name='Pontszám')),
+                ('distance', models.FloatField(blank=True, null=True, verbose_name='Távolság (km)')),
+                ('computed_at', models.DateTimeField(verbose_name='Számolva')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='events.sportevent', verbose_name='Esemény')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='precomputed_recommendations', to=settings.AUTH_USER_MODEL, verbose_name='Felhasználó')),
+            ],
+            options={
+                'verbose_name': 'Előre számolt ajánlás',
+                'verbose_name_plural': 'Előre számolt ajánlások',
+                'ordering': ['user', 'rank'],
+                'unique_together': {('user', 'rank')},
+            },
+        ),
+    ]
@@ -1,8 +1,55 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from accounts.models import User, SportType
-from django.db.models import Sum
+from django.db.models import Sum, Count, F, Q, Value, Prefetch, OuterRef, Subquery, ExpressionWrapper, IntegerField, BooleanField
+from django.db.models.functions import Coalesce, Greatest, Now
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from datetime import timedelta
+
+
+# Befejezési időpont és időtartam nélküli események ennyi ideig számítanak folyamatban lévőnek
+DEFAULT_EVENT_DURATION = timedelta(hours=3)
+
+
+class SportEventQuerySet(models.QuerySet):
+    """
+    Esemény lekérdezések közös annotációi
+    """
+    def with_occupancy(self):
+        """
+        Teltségi adatok SQL annotációként, join nélkül a számláló oszlopokból:
+        occupancy_count, occupancy_available, occupancy_is_full.
+        A participants_count / available_spots / is_full ezeket használja, ha vannak.
+        """
+        taken = ExpressionWrapper(
+            F('confirmed_count') + F('confirmed_guests') + Greatest(F('reserved_spots') - 1, Value(0)),
+            output_field=IntegerField()
+        )
+        return self.annotate(
+            occupancy_count=taken,
+        ).annotate(
+            occupancy_available=ExpressionWrapper(
+                Greatest(F('max_participants') - F('occupancy_count'), Value(0)),
+                output_field=IntegerField()
+            ),
+            occupancy_is_full=ExpressionWrapper(
+                Q(occupancy_count__gte=F('max_participants')),
+                output_field=BooleanField()
+            ),
+        )
+    
+    def with_primary_image(self):
+        """
+        Eseményenként csak a megjelenítendő kép előtöltése a 'primary_images'
+        listába: az elsődleges kép, ennek hiányában a legfrissebb.
+        """
+        return self.prefetch_related(Prefetch(
+            'images',
+            queryset=EventImage.objects.order_by('-is_primary', '-uploaded_at')[:1],
+            to_attr='primary_images'
+        ))
 
 
 class SportEvent(models.Model):
@@ -66,6 +113,12 @@ class SportEvent(models.Model):
         help_text="Esemény várható időtartama percben"
     )
     
+    # end_date_time / duration_minutes / DEFAULT_EVENT_DURATION feloldva, mentéskor számolva
+    effective_end_time = models.DateTimeField(
+        editable=False,
+        verbose_name="Tényleges befejezés"
+    )
+    
     # Helyszín
     location_name = models.CharField(
         max_length=200,
@@ -111,6 +164,32 @@ class SportEvent(models.Model):
         help_text="Hány barátoddal szervezed az eseményt?"
     )
     
+    # Denormalizált létszám számlálók (EventParticipant mentéskor frissül)
+    confirmed_count = models.IntegerField(
+        default=0,
+        verbose_name="Megerősített résztvevők",
+        help_text="Megerősített jelentkezések száma"
+    )
+    
+    confirmed_guests = models.IntegerField(
+        default=0,
+        verbose_name="Megerősített vendégek",
+        help_text="A megerősített résztvevők plusz vendégeinek összege"
+    )
+    
+    # Változás jelölők a feltételes GET (ETag / Last-Modified) számításához
+    participants_changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Résztvevők utolsó változása"
+    )
+    
+    images_changed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Képek utolsó változása"
+    )
+    
     # Nehézség és egyéb
     difficulty = models.CharField(
         max_length=20,
@@ -164,6 +243,11 @@ class SportEvent(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Létrehozva")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Frissítve")
     
+    objects = SportEventQuerySet.as_manager()
+    
+    # Csak atomi / tömeges UPDATE-tel vagy kifejezett update_fields-szel írt oszlopok
+    MAINTAINED_FIELDS = ('confirmed_count', 'confirmed_guests', 'participants_changed_at', 'images_changed_at', 'status')
+    
     class Meta:
         verbose_name = "Sportesemény"
         verbose_name_plural = "Sportesemények"
@@ -172,6 +256,8 @@ class SportEvent(models.Model):
             models.Index(fields=['start_date_time', 'status']),
             models.Index(fields=['latitude', 'longitude']),
             models.Index(fields=['sport_type', 'status']),
+            models.Index(fields=['start_date_time', 'id']),
+            models.Index(fields=['is_public', 'effective_end_time', 'start_date_time']),
         ]
     
     def __str__(self):
@@ -180,23 +266,28 @@ class SportEvent(models.Model):
     @property
     def participants_count(self):
         """Hányan vesznek részt az eseményen összesen"""
-        confirmed_qs = self.participants.filter(status='confirmed')
-        base_count = confirmed_qs.count()
-    
-        extra_guests_sum = confirmed_qs.aggregate(total=Sum('extra_guests'))['total'] or 0
+        annotated = getattr(self, 'occupancy_count', None)
+        if annotated is not None:
+            return annotated
         
         creator_friends = max(0, self.reserved_spots - 1)
         
-        return base_count + extra_guests_sum + creator_friends
+        return self.confirmed_count + self.confirmed_guests + creator_friends
 
     @property
     def is_full(self):
         """Ellenőrzi, hogy betelt-e az esemény"""
+        annotated = getattr(self, 'occupancy_is_full', None)
+        if annotated is not None:
+            return annotated
         return self.participants_count >= self.max_participants
     
     @property
     def available_spots(self):
         """Hány szabad hely van még"""
+        annotated = getattr(self, 'occupancy_available', None)
+        if annotated is not None:
+            return annotated
         return max(0, self.max_participants - self.participants_count)
     
     @property
@@ -215,6 +306,107 @@ class SportEvent(models.Model):
         if self.participants.filter(user=user, status__in=['pending', 'confirmed']).exists():
             return False, "Már jelentkeztél erre az eseményre"
         return True, "Jelentkezhetsz"
+    
+    def compute_effective_end_time(self):
+        """end_date_time, ennek hiányában kezdés + időtartam, végül kezdés + DEFAULT_EVENT_DURATION"""
+        if self.end_date_time:
+            return self.end_date_time
+        if self.duration_minutes:
+            return self.start_date_time + timedelta(minutes=self.duration_minutes)
+        return self.start_date_time + DEFAULT_EVENT_DURATION
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._saved_status = instance.status
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.effective_end_time = self.compute_effective_end_time()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = self._editable_update_fields()
+        elif update_fields is not None and {'start_date_time', 'end_date_time', 'duration_minutes'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'effective_end_time'}
+        super().save(*args, **kwargs)
+        self._saved_status = self.status
+    
+    def _editable_update_fields(self):
+        """
+        Teljes mentés írható mezői. A MAINTAINED_FIELDS oszlopokat F() delták
+        és tömeges UPDATE-ek tartják karban, egy korábban betöltött példány
+        elavult értéke nem írhatja felül őket; csak kifejezett update_fields-szel
+        menthetők. A státusz akkor kerül be, ha a betöltés óta megváltozott.
+        """
+        skipped = set(self.MAINTAINED_FIELDS) | self.get_deferred_fields()
+        if self.status != getattr(self, '_saved_status', None):
+            skipped.discard('status')
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key and field.name not in skipped and field.attname not in skipped
+        ]
+    
+    def lifecycle_status(self, now=None):
+        """
+        Az időpontokból következő státusz, ugyanazokkal a határokkal, mint a
+        lista szűrői (a törölt esemény törölt marad)
+        """
+        if self.status == 'cancelled':
+            return 'cancelled'
+        now = now or timezone.now()
+        if now < self.start_date_time:
+            return 'upcoming'
+        if now < self.compute_effective_end_time():
+            return 'ongoing'
+        return 'completed'
+    
+    @property
+    def current_status(self):
+        """
+        A kiküldött státusz: a lezárt vagy törölt esemény tárolt értéke,
+        egyébként az effective_end_time alapján, az ütemező futásától függetlenül
+        """
+        if self.status in ('cancelled', 'completed'):
+            return self.status
+        return self.lifecycle_status()
+    
+    @classmethod
+    def advance_statuses(cls, now=None):
+        """
+        Az esedékes státuszváltások két tömeges UPDATE-tel: előbb a lejártak
+        befejezetté (közvetlenül upcoming-ból is), majd az elkezdettek
+        folyamatban lévővé. Az updated_at is frissül, így az ETag-ek és a
+        Last-Modified követik a váltást. Visszatér: (elkezdett, befejezett).
+        """
+        now = now or timezone.now()
+        completed = cls.objects.filter(
+            status__in=['upcoming', 'ongoing'],
+            effective_end_time__lte=now
+        ).update(status='completed', updated_at=now)
+        started = cls.objects.filter(
+            status='upcoming',
+            start_date_time__lte=now
+        ).update(status='ongoing', updated_at=now)
+        return started, completed
+    
+    @classmethod
+    def refresh_occupancy(cls, event_ids=None):
+        """
+        Számlálók újraszámolása a résztvevő táblából (tömeges módosítások
+        után és eltérés javításához). Visszatér a frissített események számával.
+        """
+        confirmed = EventParticipant.objects.filter(
+            event=OuterRef('pk'),
+            status='confirmed'
+        ).order_by().values('event')
+        
+        queryset = cls.objects.all() if event_ids is None else cls.objects.filter(pk__in=event_ids)
+        return queryset.update(
+            confirmed_count=Coalesce(Subquery(confirmed.annotate(total=Count('id')).values('total')), 0),
+            confirmed_guests=Coalesce(Subquery(confirmed.annotate(total=Sum('extra_guests')).values('total')), 0),
+            participants_changed_at=Now()
+        )
 
 
 class EventParticipant(models.Model):
@@ -296,11 +488,132 @@ class EventParticipant(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.event.title} ({self.status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names and 'extra_guests' in field_names:
+            instance._saved_occupancy = instance.occupancy
+        if 'status' in field_names and 'rating' in field_names:
+            instance._saved_rating = instance.rating_contribution
+        return instance
+    
+    @property
+    def occupancy(self):
+        """Mennyivel növeli az esemény számlálóit: (résztvevő, vendég)"""
+        if self.status == 'confirmed':
+            return 1, self.extra_guests
+        return 0, 0
+    
+    @property
+    def rating_contribution(self):
+        """Mennyivel növeli a szervező értékelés számlálóit: (összeg, darab)"""
+        if self.status == 'confirmed' and self.rating is not None:
+            return self.rating, 1
+        return 0, 0
+    
+    @classmethod
+    def refresh_organizer_ratings(cls, user_ids=None):
+        """
+        Szervezői értékelés számlálók újraszámolása a résztvevő táblából.
+        Visszatér a frissített felhasználók számával.
+        """
+        rated = cls.objects.filter(
+            event__creator=OuterRef('pk'),
+            status='confirmed',
+            rating__isnull=False
+        ).order_by().values('event__creator')
+        
+        queryset = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+        return queryset.update(
+            organizer_rating_sum=Coalesce(Subquery(rated.annotate(total=Sum('rating')).values('total')), 0),
+            organizer_rating_count=Coalesce(Subquery(rated.annotate(total=Count('id')).values('total')), 0),
+            updated_at=Now()
+        )
+    
     def save(self, *args, **kwargs):
         if not self.event.requires_approval and self.status == 'pending':
             self.status = 'confirmed'
             self.confirmed_at = timezone.now()
-        super().save(*args, **kwargs)
+        
+        previous = (0, 0) if self._state.adding else getattr(self, '_saved_occupancy', None)
+        previous_rating = (0, 0) if self._state.adding else getattr(self, '_saved_rating', None)
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._update_event_occupancy(previous, self.occupancy)
+            self._update_organizer_rating(previous_rating, self.rating_contribution)
+        
+        self._saved_occupancy = self.occupancy
+        self._saved_rating = self.rating_contribution
+    
+    def _update_event_occupancy(self, previous, current):
+        """
+        Az esemény számlálóinak atomi frissítése a változás mértékével,
+        egyben a résztvevők változás jelölőjének frissítése
+        """
+        if previous is None:
+            SportEvent.refresh_occupancy([self.event_id])
+            return
+        
+        delta_count = current[0] - previous[0]
+        delta_guests = current[1] - previous[1]
+        changed_at = timezone.now()
+        
+        changes = {'participants_changed_at': changed_at}
+        if delta_count or delta_guests:
+            changes['confirmed_count'] = F('confirmed_count') + delta_count
+            changes['confirmed_guests'] = F('confirmed_guests') + delta_guests
+        SportEvent.objects.filter(pk=self.event_id).update(**changes)
+        
+        if EventParticipant.event.is_cached(self):
+            self.event.participants_changed_at = changed_at
+            if delta_count or delta_guests:
+                self.event.confirmed_count += delta_count
+                self.event.confirmed_guests += delta_guests
+                # a with_occupancy() annotációk már elavultak
+                for attr in ('occupancy_count', 'occupancy_available', 'occupancy_is_full'):
+                    self.event.__dict__.pop(attr, None)
+    
+    def _update_organizer_rating(self, previous, current):
+        """A szervező értékelés számlálóinak atomi frissítése a változás mértékével"""
+        creator_id = self.event.creator_id
+        if previous is None:
+            EventParticipant.refresh_organizer_ratings([creator_id])
+            return
+        
+        delta_sum = current[0] - previous[0]
+        delta_count = current[1] - previous[1]
+        if not delta_sum and not delta_count:
+            return
+        
+        User.objects.filter(pk=creator_id).update(
+            organizer_rating_sum=F('organizer_rating_sum') + delta_sum,
+            organizer_rating_count=F('organizer_rating_count') + delta_count,
+            updated_at=timezone.now()
+        )
+        
+        if SportEvent.creator.is_cached(self.event):
+            self.event.creator.organizer_rating_sum += delta_sum
+            self.event.creator.organizer_rating_count += delta_count
+
+
+@receiver(post_delete, sender=EventParticipant)
+def release_event_occupancy(sender, instance, **kwargs):
+    """Törölt résztvevő helyének és értékelésének kivezetése a számlálókból"""
+    count, guests = instance.occupancy
+    SportEvent.objects.filter(pk=instance.event_id).update(
+        confirmed_count=F('confirmed_count') - count,
+        confirmed_guests=F('confirmed_guests') - guests,
+        participants_changed_at=timezone.now()
+    )
+    
+    rating_sum, rating_count = instance.rating_contribution
+    if rating_count:
+        User.objects.filter(created_events__id=instance.event_id).update(
+            organizer_rating_sum=F('organizer_rating_sum') - rating_sum,
+            organizer_rating_count=F('organizer_rating_count') - rating_count,
+            updated_at=timezone.now()
+        )
 
 
 class EventImage(models.Model):
@@ -344,3 +657,51 @@ class EventImage(models.Model):
     
     def __str__(self):
         return f"Kép - {self.event.title}"
+
+
+@receiver(post_save, sender=EventImage)
+@receiver(post_delete, sender=EventImage)
+def touch_event_images(sender, instance, **kwargs):
+    """A képek változás jelölőjének frissítése"""
+    SportEvent.objects.filter(pk=instance.event_id).update(images_changed_at=timezone.now())
+
+
+class UserRecommendation(models.Model):
+    """
+    Előre kiszámolt ajánlás (precompute_recommendations parancs): a
+    felhasználó legjobb N eseménye rangsorban
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='precomputed_recommendations',
+        verbose_name="Felhasználó"
+    )
+    
+    event = models.ForeignKey(
+        SportEvent,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Esemény"
+    )
+    
+    rank = models.PositiveSmallIntegerField(verbose_name="Helyezés")
+    
+    score = models.FloatField(verbose_name="Pontszám")
+    
+    distance = models.FloatField(
+        blank=True,
+        null=True,
+        verbose_name="Távolság (km)"
+    )
+    
+    computed_at = models.DateTimeField(verbose_name="Számolva")
+    
+    class Meta:
+        verbose_name = "Előre számolt ajánlás"
+        verbose_name_plural = "Előre számolt ajánlások"
+        unique_together = ['user', 'rank']
+        ordering = ['user', 'rank']
+    
+    def __str__(self):
+        return f"{self.user_id} #{self.rank} - {self.event_id} ({self.score})"
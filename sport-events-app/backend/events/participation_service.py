@@ -0,0 +1,49 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import SportEvent, EventParticipant
+
+
+class JoinRejected(Exception):
+    """A jelentkezés szabályba ütközik, az üzenet a felhasználónak szól"""
+
+
+def join_event(event_id, user, notes='', extra_guests=0):
+    """
+    Jelentkezés egy eseményre egyetlen rövid tranzakcióban.
+
+    Az esemény sorát zároljuk (SELECT ... FOR UPDATE), így párhuzamos
+    jelentkezéseknél a létszám ellenőrzés és a számlálók növelése nem
+    csúszhat el egymáson - nincs túlfoglalás. A teltséget a denormalizált
+    számlálók adják, további aggregálás nélkül.
+
+    Visszatér: (event, participant). Hibák: SportEvent.DoesNotExist, JoinRejected.
+    """
+    with transaction.atomic():
+        event = SportEvent.objects.select_for_update().get(pk=event_id)
+
+        # a szabályok a modellben vannak, itt a zárolt soron futnak
+        can_join, message = event.can_user_join(user)
+        if not can_join:
+            raise JoinRejected(message)
+
+        if event.available_spots < 1 + extra_guests:
+            raise JoinRejected(f"Nincs elég hely! Már csak {event.available_spots} szabad hely maradt.")
+
+        now = timezone.now()
+        initial_status = 'pending' if event.requires_approval else 'confirmed'
+
+        # korábban lemondott vagy elutasított jelentkezés újra aktiválódik
+        participant = EventParticipant.objects.filter(event=event, user=user).first()
+        if participant is None:
+            participant = EventParticipant(event=event, user=user)
+        else:
+            participant.event = event
+
+        participant.status = initial_status
+        participant.notes = notes
+        participant.extra_guests = extra_guests
+        participant.joined_at = now
+        participant.confirmed_at = now if initial_status == 'confirmed' else None
+        participant.save()
+
+    return event, participant
@@ -0,0 +1,128 @@
+"""
+Felhasználónkénti ajánlás cache.
+
+A kiszámolt rangsor [(event_id, score, distance), ...] formában kerül a
+cache-be, a függőségei verzióival együtt: a felhasználó saját verziója
+(preferenciák, helyadatok, részvételek) és az érintett sportágak verziói
+(esemény létrehozás, betelés, lemondás). Olvasáskor egyetlen get_many
+dönti el, hogy a bejegyzés még érvényes-e; a rövid TTL a signal nélküli
+tömeges módosítások (pl. státusz léptetés) ellen véd.
+"""
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import User, UserSportPreference
+from .models import SportEvent, EventParticipant
+from .response_cache import VERSION_KEY as EVENTS_VERSION_KEY
+
+
+RECOMMENDATION_CACHE_TIMEOUT = 300
+
+
+def user_version_key(user_id):
+    return f'recommendations:user:{user_id}'
+
+
+def sport_version_key(sport_type_id):
+    return f'recommendations:sport:{sport_type_id}'
+
+
+def _initial_version():
+    """
+    Időbélyeg induló érték: egy kiszorított vagy kiürített verzió kulcs újra
+    létrehozva sem veheti fel egy korábbi bejegyzés függőség verzióját
+    """
+    return int(time.time() * 1000)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def _versions(keys):
+    """A kulcsok aktuális verziói; a hiányzókat időbélyeggel létrehozza"""
+    versions = cache.get_many(keys)
+    for key in set(keys) - versions.keys():
+        initial = _initial_version()
+        cache.add(key, initial, None)
+        versions[key] = cache.get(key, initial)
+    return versions
+
+
+def get_cached_recommendations(user):
+    """A cache-elt rangsor, vagy None, ha nincs vagy valamelyik függősége változott"""
+    entry = cache.get(f'recommendations:{user.pk}')
+    if entry is None:
+        return None
+    if cache.get_many(list(entry['deps'])) != entry['deps']:
+        return None
+    return entry['ranking']
+
+
+def dependency_versions(user, sport_type_ids):
+    """
+    A számítás előtt rögzített függőség verziók. sport_type_ids: a számításban
+    részt vevő sportágak; ha üres (preferencia és előzmény nélküli
+    felhasználó), bármely esemény módosítása érvényteleníti.
+    """
+    keys = [user_version_key(user.pk)]
+    if sport_type_ids:
+        keys += [sport_version_key(sport_id) for sport_id in sport_type_ids]
+    else:
+        keys.append(EVENTS_VERSION_KEY)
+    return _versions(keys)
+
+
+def set_cached_recommendations(user, ranking, deps):
+    cache.set(
+        f'recommendations:{user.pk}',
+        {'deps': deps, 'ranking': ranking},
+        RECOMMENDATION_CACHE_TIMEOUT
+    )
+
+
+def invalidate_user(user_id):
+    transaction.on_commit(lambda: _bump(user_version_key(user_id)))
+
+
+def invalidate_sport(sport_type_id):
+    transaction.on_commit(lambda: _bump(sport_version_key(sport_type_id)))
+
+
+@receiver(post_save, sender=SportEvent)
+@receiver(post_delete, sender=SportEvent)
+def invalidate_on_event_change(sender, instance, **kwargs):
+    invalidate_sport(instance.sport_type_id)
+
+
+@receiver(post_save, sender=EventParticipant)
+@receiver(post_delete, sender=EventParticipant)
+def invalidate_on_participation_change(sender, instance, **kwargs):
+    # a résztvevőnek az előzményei, a sportág többi felhasználójának a teltség változik
+    invalidate_user(instance.user_id)
+    if EventParticipant.event.is_cached(instance):
+        sport_type_id = instance.event.sport_type_id
+    else:
+        # kaszkád törlésnél az esemény már nem tölthető be, annak saját signalja érvénytelenít
+        sport_type_id = SportEvent.objects.filter(pk=instance.event_id).values_list('sport_type_id', flat=True).first()
+    if sport_type_id:
+        invalidate_sport(sport_type_id)
+
+
+@receiver(post_save, sender=UserSportPreference)
+@receiver(post_delete, sender=UserSportPreference)
+def invalidate_on_preference_change(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_change(sender, instance, update_fields=None, **kwargs):
+    """Helyadat és keresési sugár; a belépés nem számít"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_user(instance.pk)
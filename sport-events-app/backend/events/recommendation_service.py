@@ -1,18 +1,10 @@
-from django.db.models import Count, Q, F
+from django.db.models import F, Q, Value, Case, When, FloatField, ExpressionWrapper
+from django.db.models.functions import Greatest, Round
 from django.utils import timezone
-from math import radians, sin, cos, sqrt, atan2
 from collections import defaultdict
-from .models import SportEvent, EventParticipant
-
-
-def haversine(lat1, lon1, lat2, lon2):
-    """Távolság km-ben két koordináta között."""
-    R = 6371
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+from .models import SportEvent, EventParticipant, UserRecommendation
+from .geo import filter_within_radius
+from .recommendation_cache import get_cached_recommendations, set_cached_recommendations, dependency_versions
 
 
 def get_participation_history_scores(user):
@@ -29,7 +21,7 @@ def get_participation_history_scores(user):
     """
     past_participations = EventParticipant.objects.filter(
         user=user
-    ).select_related('event__sport_type')
+    ).select_related('event')
 
     sport_scores = defaultdict(float)
     sport_counts = defaultdict(int)
@@ -58,9 +50,10 @@ def get_participation_history_scores(user):
     return normalized
 
 
-def get_recommended_events(user, max_results=20):
+def get_recommended_events(user, max_results=20, queryset=None):
     """
     Pontozásos ajánlórendszer preferenciák + participation history alapján.
+    A queryset az alap lekérdezés (a hívó itt adhatja meg a join-okat/prefetch-eket).
 
     Pontszámok:
       - Preferencia interest_level:     1–10 pont
@@ -71,7 +64,10 @@ def get_recommended_events(user, max_results=20):
 
     Visszaad egy rendezett listát: [(event, score, distance), ...]
     """
-    preferences = list(user.sport_preferences.select_related('sport_type').all())
+    if queryset is None:
+        queryset = SportEvent.objects.with_occupancy().with_primary_image().select_related('creator')
+
+    preferences = list(user.sport_preferences.all())
     history_scores = get_participation_history_scores(user)
 
     pref_map = {pref.sport_type_id: pref for pref in preferences}
@@ -85,18 +81,13 @@ def get_recommended_events(user, max_results=20):
     all_relevant_sport_ids = preferred_sport_ids + history_only_sport_ids
 
     if not all_relevant_sport_ids:
-        events = SportEvent.objects.filter(
+        events = queryset.filter(
             status='upcoming',
             is_public=True,
             start_date_time__gte=timezone.now()
-        ).annotate(
-            confirmed_count=Count(
-                'participants',
-                filter=Q(participants__status='confirmed')
-            )
         ).filter(
             confirmed_count__lt=F('max_participants')
-        ).select_related('sport_type', 'creator').prefetch_related('images', 'participants')
+        )
 
         return [(event, 0, None) for event in events[:max_results]]
 
@@ -105,26 +96,25 @@ def get_recommended_events(user, max_results=20):
         .values_list('event_id', flat=True)
     )
 
-    events = SportEvent.objects.filter(
+    user_lat = float(user.default_latitude) if user.default_latitude else None
+    user_lng = float(user.default_longitude) if user.default_longitude else None
+    max_radius = user.default_search_radius or 50 
+
+    events = queryset.filter(
         sport_type_id__in=all_relevant_sport_ids,
         status='upcoming',
         is_public=True,
         start_date_time__gte=timezone.now()
     ).exclude(
         id__in=already_joined
-    ).annotate(
-        confirmed_count=Count(
-            'participants',
-            filter=Q(participants__status='confirmed')
-        )
     ).filter(
         confirmed_count__lt=F('max_participants')
-    ).select_related('sport_type', 'creator').prefetch_related('images', 'participants')
-
+    )
 
-    user_lat = float(user.default_latitude) if user.default_latitude else None
-    user_lng = float(user.default_longitude) if user.default_longitude else None
-    max_radius = user.default_search_radius or 50 
+    # Helyadat esetén csak a sugáron belüli jelöltek jönnek az adatbázisból,
+    # 'distance' annotációval, így nem kell az összes közelgő eseményt betölteni
+    if user_lat and user_lng:
+        events = filter_within_radius(events, user_lat, user_lng, max_radius)
 
     scored = []
 
@@ -142,10 +132,7 @@ def get_recommended_events(user, max_results=20):
 
         distance = None
         if user_lat and user_lng:
-            distance = haversine(
-                user_lat, user_lng,
-                float(event.latitude), float(event.longitude)
-            )
+            distance = event.distance
             if distance > max_radius:
                 continue
             distance_score = max(0.0, 5.0 * (1 - distance / max_radius))
@@ -169,6 +156,201 @@ def get_recommended_events(user, max_results=20):
     return scored[:max_results]
 
 
+def get_recommended_events_sql(user, max_results=20, queryset=None):
+    """
+    Ugyanaz a pontozás, mint a get_recommended_events-ben, de az adatbázisban:
+    az érdeklődés, a szint egyezés és az előzmény pont a felhasználó
+    sportáganként kiszámolt értékeiből Case/When kifejezés, a távolság és
+    a teltség SQL kifejezés, majd ORDER BY score DESC LIMIT max_results.
+    A queryset join-jai és prefetch-ei csak a végső sorokra futnak.
+    A Python változat a referencia (lásd events.tests).
+
+    Visszaad egy rendezett listát: [(event, score, distance), ...]
+    """
+    if queryset is None:
+        queryset = SportEvent.objects.with_occupancy().with_primary_image().select_related('creator')
+
+    pref_map = {pref.sport_type_id: pref for pref in user.sport_preferences.all()}
+    history_scores = get_participation_history_scores(user)
+    all_relevant_sport_ids = list(pref_map) + [
+        sport_id for sport_id in history_scores if sport_id not in pref_map
+    ]
+
+    candidates = SportEvent.objects.filter(
+        status='upcoming',
+        is_public=True,
+        start_date_time__gte=timezone.now(),
+        confirmed_count__lt=F('max_participants')
+    )
+
+    if not all_relevant_sport_ids:
+        return [(event, 0, None) for event in queryset.filter(pk__in=candidates.values('pk'))[:max_results]]
+
+    candidates = candidates.filter(
+        sport_type_id__in=all_relevant_sport_ids
+    ).exclude(
+        participants__user=user
+    )
+
+    user_lat = float(user.default_latitude) if user.default_latitude else None
+    user_lng = float(user.default_longitude) if user.default_longitude else None
+    max_radius = user.default_search_radius or 50
+
+    def per_sport(values):
+        return Case(
+            *[When(sport_type_id=sport_id, then=Value(float(value))) for sport_id, value in values.items()],
+            default=Value(0.0),
+            output_field=FloatField()
+        )
+
+    skill_match = Case(
+        *[
+            When(sport_type_id=sport_id, difficulty=difficulty, then=Value(_skill_match_score(pref.skill_level, difficulty)))
+            for sport_id, pref in pref_map.items()
+            for difficulty, _ in SportEvent.DIFFICULTY_CHOICES
+        ],
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+    # az arány szorzással, mert a confirmed_count / max_participants egész osztás lenne
+    fill_bonus = Case(
+        When(Q(max_participants__gt=0) & Q(confirmed_count__gte=F('max_participants') * 0.8), then=Value(2.0)),
+        When(Q(max_participants__gt=0) & Q(confirmed_count__gte=F('max_participants') * 0.5), then=Value(1.0)),
+        default=Value(0.0),
+        output_field=FloatField()
+    )
+
+    score = (
+        Value(0.0)
+        + per_sport({sport_id: pref.interest_level for sport_id, pref in pref_map.items()})
+        + skill_match
+        + per_sport(history_scores)
+    )
+
+    if user_lat and user_lng:
+        candidates = filter_within_radius(candidates, user_lat, user_lng, max_radius)
+        score = score + Greatest(
+            Value(0.0),
+            Value(5.0) * (Value(1.0) - F('distance') / Value(float(max_radius))),
+            output_field=FloatField()
+        )
+    score = score + fill_bonus
+
+    ranked = candidates.annotate(
+        score=Round(ExpressionWrapper(score, output_field=FloatField()), 2)
+    ).order_by('-score', 'start_date_time', 'id')
+
+    fields = ['id', 'score'] + (['distance'] if user_lat and user_lng else [])
+    top = list(ranked.values_list(*fields)[:max_results])
+
+    events = queryset.filter(id__in=[row[0] for row in top]).in_bulk()
+    return [
+        (
+            events[row[0]],
+            float(row[1]),
+            round(row[2], 1) if len(row) > 2 and row[2] is not None else None
+        )
+        for row in top
+        if row[0] in events
+    ]
+
+
+def get_cached_recommended_events(user, max_results=20, queryset=None):
+    """
+    get_recommended_events felhasználónkénti cache-sel. Cache tévesztéskor az
+    előre számolt (precompute_recommendations) rangsor, ha még érvényes,
+    egyébként az SQL pontozás eredménye kerül a cache-be. Találat esetén egy
+    cache olvasás és egyetlen lekérdezés a rangsorban szereplő eseményekre
+    (az időközben elkezdett vagy lemondott események kimaradnak).
+    Visszatér: [(event, score, distance), ...], ugyanúgy mint get_recommended_events.
+    """
+    if queryset is None:
+        queryset = SportEvent.objects.with_occupancy().with_primary_image().select_related('creator')
+
+    ranking = get_cached_recommendations(user)
+    if ranking is None:
+        sport_type_ids = relevant_sport_ids(user)
+        # a verziók a számítás előtt, hogy a közben érkező módosítás ne vesszen el
+        deps = dependency_versions(user, sport_type_ids)
+        scored = get_precomputed_recommended_events(user, max_results, queryset, sport_type_ids)
+        if not scored:
+            scored = get_recommended_events_sql(user, max_results=max_results, queryset=queryset)
+        set_cached_recommendations(
+            user,
+            [(event.pk, score, distance) for event, score, distance in scored],
+            deps
+        )
+        return scored
+
+    ranking = ranking[:max_results]
+    events = queryset.filter(
+        id__in=[event_id for event_id, _, _ in ranking],
+        status='upcoming',
+        start_date_time__gte=timezone.now()
+    ).in_bulk()
+    return [
+        (events[event_id], score, distance)
+        for event_id, score, distance in ranking
+        if event_id in events
+    ]
+
+
+def get_precomputed_recommended_events(user, max_results=20, queryset=None, sport_type_ids=None):
+    """
+    A precompute_recommendations által mentett rangsor, ha azóta sem a
+    felhasználó profilja (preferenciák, helyadat), sem a releváns sportágak
+    (sport_type_ids, üresen bármely sportág) közelgő eseményei nem változtak:
+    ugyanazok a függőségek, mint a recommendation_cache verzióinál, a
+    cache-től függetlenül. A közben elkezdett, betelt vagy már jelentkezett
+    események kimaradnak.
+    Visszatér: [(event, score, distance), ...] vagy None.
+    """
+    if queryset is None:
+        queryset = SportEvent.objects.with_occupancy().with_primary_image().select_related('creator')
+
+    ranking = list(UserRecommendation.objects.filter(
+        user=user,
+        computed_at__gte=user.updated_at
+    ).order_by('rank').values_list('event_id', 'score', 'distance', 'computed_at'))
+    if not ranking:
+        return None
+
+    if sport_type_ids is None:
+        sport_type_ids = relevant_sport_ids(user)
+    changed = SportEvent.objects.filter(
+        status='upcoming',
+        start_date_time__gte=timezone.now(),
+        updated_at__gt=ranking[0][3]
+    )
+    if sport_type_ids:
+        changed = changed.filter(sport_type_id__in=sport_type_ids)
+    if changed.exists():
+        # azóta létrehozott vagy módosított esemény: a rangsort újra kell számolni
+        return None
+
+    events = queryset.filter(
+        id__in=[event_id for event_id, _, _, _ in ranking],
+        status='upcoming',
+        start_date_time__gte=timezone.now(),
+        confirmed_count__lt=F('max_participants')
+    ).exclude(
+        participants__user=user
+    ).in_bulk()
+    return [
+        (events[event_id], score, distance)
+        for event_id, score, distance, _ in ranking
+        if event_id in events
+    ][:max_results]
+
+
+def relevant_sport_ids(user):
+    """Sportágak, amelyek a felhasználó ajánlásaiba bekerülhetnek (preferencia vagy előzmény)"""
+    return set(user.sport_preferences.values_list('sport_type_id', flat=True)) | set(
+        EventParticipant.objects.filter(user=user).values_list('event__sport_type_id', flat=True).distinct()
+    )
+
+
 def _skill_match_score(user_skill, event_difficulty):
     """
     Mennyire illik a felhasználó szintje az esemény nehézségéhez.
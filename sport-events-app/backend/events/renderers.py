@@ -0,0 +1,17 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class NormalizedJSONRenderer(JSONRenderer):
+    """
+    Normalizált (side-loaded) lista formátum: az elemekben csak az idegen
+    kulcsok szerepelnek, a hivatkozott objektumok egyszer, az 'included'
+    részben. Kérhető ?format=normalized paraméterrel vagy Accept fejléccel.
+    """
+    media_type = 'application/vnd.sportevents.normalized+json'
+    format = 'normalized'
+
+
+def is_normalized(request):
+    """A kérésre normalizált formátumban válaszolunk-e"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) == NormalizedJSONRenderer.format
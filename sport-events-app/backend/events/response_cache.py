@@ -0,0 +1,159 @@
+"""
+Verziózott válasz cache az esemény listához.
+
+A kulcsok tartalmazzák a globális "events version" számlálót, amit minden
+esemény-, résztvevő- és képmódosítás megnövel - így írás után a régi
+bejegyzések egyszerűen elérhetetlenné válnak, nincs szükség kulcsok
+felsorolására vagy törlésére. Django cache keretrendszert használ, így
+locmem, fájl vagy Redis backenddel egyaránt működik.
+"""
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.models import User, SportType
+from .models import SportEvent, EventParticipant, EventImage
+
+
+LIST_CACHE_TIMEOUT = 60
+UPCOMING_COUNTS_TIMEOUT = 60
+VERSION_KEY = 'events:version'
+STATS_KEYS = {
+    'hits': 'event-list-cache:hits',
+    'misses': 'event-list-cache:misses',
+}
+
+
+def get_events_version():
+    """
+    Az aktuális verzió. Hiányzó (kiszorított, kiürített) kulcsnál időbélyeggel
+    indul, így egy régi verzió alatt maradt bejegyzés nem válik újra érvényessé.
+    """
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        initial = int(time.time() * 1000)
+        cache.add(VERSION_KEY, initial, None)
+        version = cache.get(VERSION_KEY, initial)
+    return version
+
+
+def bump_events_version():
+    """Minden eddigi esemény cache bejegyzés érvénytelenítése"""
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        get_events_version()
+        return cache.incr(VERSION_KEY)
+
+
+def list_cache_key(request):
+    """
+    Kulcs a normalizált lekérdezés paraméterekből: a paraméterek sorrendje
+    nem számít, a válasz formátuma és a hoszt (abszolút URL-ek) igen.
+    """
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+        if name != 'format'
+    )
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = repr((
+        params,
+        getattr(renderer, 'format', None),
+        request.scheme,
+        request.get_host(),
+    ))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'event-list:{get_events_version()}:{digest}'
+
+
+def _count(name):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_cached_list(key):
+    """A cache-elt válasz adat vagy None (találat/tévesztés számlálással)"""
+    data = cache.get(key)
+    _count('hits' if data is not None else 'misses')
+    return data
+
+
+def set_cached_list(key, data):
+    """
+    A válasz mentése a felépítése előtt számolt kulccsal: ha közben változott
+    egy esemény, a régi sorokból készült válasz a régi verzió alá kerül
+    """
+    cache.set(key, data, LIST_CACHE_TIMEOUT)
+
+
+def upcoming_counts_by_sport():
+    """
+    {sport_type_id: közelgő publikus események száma} egyetlen GROUP BY
+    lekérdezésből. A kulcsban benne van az events version, így bármely
+    esemény módosítás után újraszámolódik; a TTL az időközben elkezdődött
+    eseményeket kezeli.
+    """
+    key = f'upcoming-counts:{get_events_version()}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(
+            SportEvent.objects.filter(
+                status='upcoming',
+                is_public=True,
+                start_date_time__gt=timezone.now()
+            ).order_by().values('sport_type').annotate(
+                total=Count('id')
+            ).values_list('sport_type', 'total')
+        )
+        cache.set(key, counts, UPCOMING_COUNTS_TIMEOUT)
+    return counts
+
+
+def cache_stats():
+    counters = cache.get_many(list(STATS_KEYS.values()))
+    stats = {name: counters.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / total, 3) if total else None
+    stats['version'] = get_events_version()
+    stats['timeout'] = LIST_CACHE_TIMEOUT
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many(list(STATS_KEYS.values()))
+
+
+@receiver(post_save, sender=SportEvent)
+@receiver(post_delete, sender=SportEvent)
+@receiver(post_save, sender=EventParticipant)
+@receiver(post_delete, sender=EventParticipant)
+@receiver(post_save, sender=EventImage)
+@receiver(post_delete, sender=EventImage)
+@receiver(post_save, sender=SportType)
+@receiver(post_delete, sender=SportType)
+def invalidate_on_event_change(sender, **kwargs):
+    # commit után, különben egy párhuzamos kérés a régi adatot tehetné az új verzió alá
+    transaction.on_commit(bump_events_version)
+
+
+@receiver(post_save, sender=User)
+def invalidate_on_user_change(sender, instance, created, update_fields=None, **kwargs):
+    """
+    A szervező rövid profilja a listában is megjelenik: csak akkor
+    érvénytelenít, ha az változott, és a felhasználónak van eseménye
+    (regisztráció, belépés, egyéb profil mezők nem számítanak)
+    """
+    if created or not instance.summary_changed(update_fields):
+        return
+    if SportEvent.objects.filter(creator_id=instance.pk).exists():
+        transaction.on_commit(bump_events_version)
@@ -0,0 +1,186 @@
+"""
+Keresés az eseményekben.
+
+PostgreSQL-en a migráció egy súlyozott 'search_vector' tsvector oszlopot
+hoz létre (cím > helyszín > leírás) GIN indexszel, amit trigger tart
+szinkronban. A ?search= ilyenkor ezen fut, relevancia szerint rendezve;
+más adatbázison a DRF SearchFilter ILIKE keresése marad.
+
+A gépelés közbeni javaslatok (helyszín, cím) pg_trgm GIN indexeken
+futnak prefix és hasonlóság alapú egyezéssel, rövid prefix cache-sel;
+pg_trgm nélkül prefix/részszöveg egyezéssel.
+"""
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import FloatField, BooleanField, IntegerField, Count, Q, Value, Case, When
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+SEARCH_COLUMN = 'search_vector'
+
+# Magyar szótőképzés; ha az unaccent kiterjesztés elérhető, az ékezetek nélküli
+# változatot a migráció hozza létre, és a keresés is azt használja
+UNACCENT_CONFIG = 'sportevents_hu'
+FALLBACK_CONFIG = 'hungarian'
+
+SUGGEST_MIN_LENGTH = 2
+SUGGEST_MAX_LENGTH = 64
+SUGGEST_LIMIT = 8
+SUGGEST_CACHE_TIMEOUT = 300
+SIMILARITY_THRESHOLD = 0.3
+
+_search_columns = {}
+_search_config = []
+_extensions = {}
+
+
+def has_search_vector(model):
+    """
+    Van-e 'search_vector' oszlopa a model táblájának.
+    Folyamatonként egyszer kérdezi le, SQLite-on mindig False.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    table = model._meta.db_table
+    if table not in _search_columns:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = %s AND column_name = %s AND udt_name = 'tsvector'",
+                [table, SEARCH_COLUMN]
+            )
+            _search_columns[table] = cursor.fetchone() is not None
+    return _search_columns[table]
+
+
+def search_config():
+    """A migráció által használt szöveges keresési konfiguráció neve"""
+    if not _search_config:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_ts_config WHERE cfgname = %s", [UNACCENT_CONFIG])
+            _search_config.append(UNACCENT_CONFIG if cursor.fetchone() else FALLBACK_CONFIG)
+    return _search_config[0]
+
+
+def full_text_search(queryset, terms):
+    """
+    websearch_to_tsquery szűrés a GIN indexen ("idézőjeles kifejezés",
+    -kizárás és OR is használható), 'search_rank' annotációval
+    """
+    column = f'"{queryset.model._meta.db_table}"."{SEARCH_COLUMN}"'
+    query = 'websearch_to_tsquery(%s::regconfig, %s)'
+    params = (search_config(), terms)
+
+    return queryset.filter(RawSQL(
+        f'{column} @@ {query}', params, output_field=BooleanField()
+    )).annotate(
+        search_rank=RawSQL(f'ts_rank_cd({column}, {query})', params, output_field=FloatField())
+    )
+
+
+class EventSearchFilter(filters.SearchFilter):
+    """
+    ?search= a tsvector oszlopon, ha van, egyébként a megszokott
+    search_fields szerinti ILIKE keresés
+    """
+    def filter_queryset(self, request, queryset, view):
+        terms = ' '.join(self.get_search_terms(request))
+        if not terms or not has_search_vector(queryset.model):
+            return super().filter_queryset(request, queryset, view)
+        return full_text_search(queryset, terms)
+
+
+def has_trigram_extension():
+    """Telepítve van-e a pg_trgm (folyamatonként egyszer kérdezi le)"""
+    if connection.vendor != 'postgresql':
+        return False
+
+    if 'pg_trgm' not in _extensions:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _extensions['pg_trgm'] = cursor.fetchone() is not None
+    return _extensions['pg_trgm']
+
+
+def _escape_like(value):
+    """LIKE minta speciális karaktereinek escape-elése"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _match(queryset, field, prefix, fuzzy):
+    """
+    Prefix, illetve pg_trgm esetén hasonlóság (%) szerinti egyezés, anélkül
+    részszöveg. 'match_rank' (prefix találat) és 'similarity' annotációval.
+    """
+    if fuzzy:
+        column = f'"{queryset.model._meta.db_table}"."{field}"'
+        # nyers ILIKE: az istartswith UPPER(col) LIKE-ja nem használná a gin_trgm_ops indexet
+        pattern = _escape_like(prefix) + '%'
+        queryset = queryset.filter(
+            Q(RawSQL(f'{column} ILIKE %s', (pattern,), output_field=BooleanField())) |
+            Q(RawSQL(f'{column} %% %s', (prefix,), output_field=BooleanField()))
+        ).annotate(
+            similarity=RawSQL(f'similarity({column}, %s)', (prefix,), output_field=FloatField())
+        )
+    else:
+        queryset = queryset.filter(**{f'{field}__icontains': prefix}).annotate(
+            similarity=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.annotate(match_rank=Case(
+        When(**{f'{field}__istartswith': prefix}, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    ))
+
+
+def suggest(queryset, prefix, limit=SUGGEST_LIMIT):
+    """
+    Gépelés közbeni javaslatok: {'locations': [...], 'titles': [...]}.
+    A helyszínek név + koordináta szerint egyediek, a gyakoribbak előre.
+    Az eredmény a normalizált prefixhez SUGGEST_CACHE_TIMEOUT másodpercig cache-elt.
+    """
+    prefix = ' '.join(prefix.split()).lower()[:SUGGEST_MAX_LENGTH]
+    if len(prefix) < SUGGEST_MIN_LENGTH:
+        return {'locations': [], 'titles': []}
+
+    key = f'event-suggest:{limit}:{prefix}'
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    fuzzy = has_trigram_extension()
+    if fuzzy:
+        # a % operátor küszöbe ebben a kapcsolatban
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.similarity_threshold', %s, false)",
+                [str(SIMILARITY_THRESHOLD)]
+            )
+
+    locations = _match(queryset, 'location_name', prefix, fuzzy).values(
+        'location_name', 'location_address', 'latitude', 'longitude'
+    ).annotate(
+        events=Count('id')
+    ).order_by('-match_rank', '-similarity', '-events', 'location_name')[:limit]
+
+    titles = _match(queryset, 'title', prefix, fuzzy).values('title').annotate(
+        events=Count('id')
+    ).order_by('-match_rank', '-similarity', '-events', 'title')[:limit]
+
+    result = {
+        'locations': [
+            {
+                'name': row['location_name'],
+                'address': row['location_address'],
+                'latitude': row['latitude'],
+                'longitude': row['longitude'],
+            }
+            for row in locations
+        ],
+        'titles': [row['title'] for row in titles],
+    }
+    cache.set(key, result, SUGGEST_CACHE_TIMEOUT)
+    return result
@@ -1,48 +1,147 @@
 from rest_framework import serializers
 from django.utils import timezone
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, NullIf
 from datetime import timedelta
 from .models import SportEvent, EventParticipant, EventImage
-from accounts.models import UserSportPreference
-from accounts.serializers import UserSerializer, SportTypeSerializer
+from .geo import haversine_many, has_geography_column, postgis_within, filter_within_radius
+from .renderers import is_normalized
+from .response_cache import bump_events_version
+from accounts.models import User, DEFAULT_SEARCH_RADIUS_KM, MAX_SEARCH_RADIUS_KM
+from accounts.catalog import get_sport_type_data
+from accounts.serializers import UserSummarySerializer, CatalogSportTypeField
 from notifications.services import notify_recommended_event
-from math import radians, sin, cos, sqrt, atan2
+
 
 def trigger_recommendation_notifications(event):
     """
     Kikeresi azokat a felhasználókat, akiknek a preferenciái és a helyzete
     passzol az új eseményhez, és értesíti őket.
+    Az értesítés egyszeri, ezért a jelöltek mindig az adatbázisból jönnek:
+    az adott sportágat kedvelők, befoglaló téglalap (PostGIS esetén
+    ST_DWithin) előszűréssel a legnagyobb megengedett sugárra, majd
+    mindenki a saját keresési sugarával.
     """
-    matching_preferences = UserSportPreference.objects.filter(
-        sport_type=event.sport_type
-    ).select_related('user')
-    
-    for pref in matching_preferences:
-        user = pref.user
-        
-        if user == event.creator:
-            continue
-            
-        if user.default_latitude and user.default_longitude and event.latitude and event.longitude:
-            try:
-                R = 6371 
-                lat1 = radians(float(user.default_latitude))
-                lon1 = radians(float(user.default_longitude))
-                lat2 = radians(float(event.latitude))
-                lon2 = radians(float(event.longitude))
-                
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                
-                a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                c = 2 * atan2(sqrt(a), sqrt(1-a))
-                distance = R * c
+    if not event.latitude or not event.longitude:
+        return
+
+    lat, lng = float(event.latitude), float(event.longitude)
+    users = User.objects.filter(
+        sport_preferences__sport_type_id=event.sport_type_id,
+        is_active=True
+    ).exclude(id=event.creator_id)
+
+    if has_geography_column(User):
+        users = postgis_within(
+            users, lat, lng,
+            MAX_SEARCH_RADIUS_KM,
+            radius_sql=f'COALESCE(NULLIF("accounts_user"."default_search_radius", 0), {DEFAULT_SEARCH_RADIUS_KM})'
+        )
+    else:
+        users = filter_within_radius(
+            users, lat, lng,
+            MAX_SEARCH_RADIUS_KM,
+            lat_field='default_latitude',
+            lng_field='default_longitude'
+        ).filter(distance__lte=Coalesce(
+            NullIf(F('default_search_radius'), Value(0)),
+            Value(DEFAULT_SEARCH_RADIUS_KM)
+        ))
+
+    for user in users:
+        notify_recommended_event(user, event)
+
+
+def _request_location(request):
+    """A kérésben megadott (user_lat, user_lng) vagy None"""
+    if not request or not request.query_params.get('user_lat') or not request.query_params.get('user_lng'):
+        return None
+    try:
+        return float(request.query_params.get('user_lat')), float(request.query_params.get('user_lng'))
+    except (ValueError, TypeError):
+        return None
+
+
+def _request_fieldset(request):
+    """
+    A kérés ?fields=... és ?expand=... paraméterei:
+    (mezőnevek halmaza vagy None, kibontandó kapcsolatok halmaza)
+    """
+    if not request:
+        return None, set()
+
+    def split(name):
+        value = request.query_params.get(name)
+        if value is None:
+            return None
+        return {part.strip() for part in value.split(',') if part.strip()}
+
+    return split('fields'), split('expand') or set()
+
+
+class SparseFieldsMixin:
+    """
+    Ritkított mezőkészlet: ?fields=id,title,... esetén csak a felsorolt mezők,
+    ?expand=creator,... esetén a beágyazott objektumok is szerepelnek.
+    expandable_fields: expand név -> mező név, opt_in_fields: csak kibontásra
+    megjelenő mezők, side_loaded_fields: normalizált válaszban az 'included'
+    részbe kerülő beágyazott objektumok. Paraméterek nélkül a megszokott
+    teljes válasz megy ki.
+    """
+    expandable_fields = {}
+    opt_in_fields = ()
+    side_loaded_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        for name in list(self.fields):
+            if not self.wants_field(request, name):
+                self.fields.pop(name)
+
+    @classmethod
+    def wants_field(cls, request, name):
+        """Szerepel-e a mező a válaszban (a view ez alapján optimalizálja a lekérdezést)"""
+        if name not in cls.Meta.fields:
+            return False
+        if name in cls.side_loaded_fields and is_normalized(request):
+            return False
+        fields, expand = _request_fieldset(request)
+        if name in {cls.expandable_fields[key] for key in expand if key in cls.expandable_fields}:
+            return True
+        if fields is not None:
+            return name in fields
+        return name not in cls.opt_in_fields
+
+
+def build_included(objects, relations, context):
+    """
+    Normalizált válasz 'included' része: a relations minden
+    (kulcs, idegen kulcs attribútum, betöltő) elemére a hivatkozott
+    objektumok egyszer. A betöltő az id halmazból és a serializer
+    contextből adja a szerializált listát.
+    """
+    included = {}
+    for key, attname, loader in relations:
+        ids = {getattr(obj, attname) for obj in objects} - {None}
+        included[key] = loader(ids, context)
+    return included
+
+
+def load_sport_types(ids, context):
+    """Sportágak a katalógusból, lekérdezés nélkül"""
+    return [item for item in map(get_sport_type_data, sorted(ids)) if item is not None]
+
+
+def load_users(ids, context):
+    """Felhasználók egyetlen lekérdezéssel"""
+    return UserSummarySerializer(
+        User.objects.filter(pk__in=ids).order_by('pk'),
+        many=True,
+        context=context
+    ).data
 
-                radius = user.default_search_radius or 20
-                if distance <= radius:
-                    notify_recommended_event(user, event)
-                    
-            except (ValueError, TypeError):
-                continue
 
 class EventImageSerializer(serializers.ModelSerializer):
     """
@@ -54,11 +153,13 @@ class EventImageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'uploaded_at']
 
 
-class EventParticipantSerializer(serializers.ModelSerializer):
+class EventParticipantSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Esemény résztvevő serializer
     """
-    user_detail = UserSerializer(source='user', read_only=True)
+    side_loaded_fields = ('user_detail',)
+
+    user_detail = UserSummarySerializer(source='user', read_only=True)
     
     class Meta:
         model = EventParticipant
@@ -77,15 +178,48 @@ class EventParticipantSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'joined_at', 'confirmed_at']
 
 
-class SportEventListSerializer(serializers.ModelSerializer):
+class SportEventListListSerializer(serializers.ListSerializer):
+    """
+    Lista serializer, ami az oldal összes eseményének távolságát
+    egyetlen vektorizált hívással számolja ki
+    """
+    def to_representation(self, data):
+        # a QuerySet-et csak egyszer értékeljük ki (a .all() új lekérdezést indítana),
+        # a related manager-ből viszont csak .all()-lal kapunk sorokat
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+
+        location = _request_location(self.context.get('request'))
+        missing = [item for item in items if getattr(item, 'distance', None) is None]
+        if location is not None and missing and 'distance' in self.child.fields:
+            distances = haversine_many(
+                location[0], location[1],
+                [item.latitude for item in missing],
+                [item.longitude for item in missing]
+            )
+            for item, distance in zip(missing, distances):
+                item.distance = float(distance)
+
+        return super().to_representation(items)
+
+
+class SportEventListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Események listázására (kevesebb adat)
     """
-    sport_type_detail = SportTypeSerializer(source='sport_type', read_only=True)
-    creator_detail = UserSerializer(source='creator', read_only=True)
+    expandable_fields = {
+        'creator': 'creator_detail',
+        'sport_type': 'sport_type_detail',
+        'images': 'images',
+    }
+    opt_in_fields = ('images',)
+    side_loaded_fields = ('creator_detail', 'sport_type_detail')
+
+    sport_type_detail = CatalogSportTypeField()
+    creator_detail = UserSummarySerializer(source='creator', read_only=True)
+    images = EventImageSerializer(many=True, read_only=True)
     primary_image = serializers.SerializerMethodField()
     participants_count = serializers.SerializerMethodField()
-    status = serializers.SerializerMethodField()
+    status = serializers.ReadOnlyField(source='current_status')
     is_full = serializers.ReadOnlyField()
     available_spots = serializers.ReadOnlyField()
     distance = serializers.SerializerMethodField()
@@ -121,16 +255,21 @@ class SportEventListSerializer(serializers.ModelSerializer):
             'is_full',
             'available_spots',
             'primary_image',
+            'images',
             'distance',
             'recommendation_score',
             'created_at',
             'reserved_spots'
         ]
         read_only_fields = ['id', 'created_at', 'creator']
+        list_serializer_class = SportEventListListSerializer
     
     def get_primary_image(self, obj):
-        """Elsődleges kép URL-je"""
-        primary = obj.images.filter(is_primary=True).first()
+        """Elsődleges (ennek hiányában a legfrissebb) kép URL-je"""
+        images = getattr(obj, 'primary_images', None)
+        if images is None:
+            images = obj.images.order_by('-is_primary', '-uploaded_at')[:1]
+        primary = next(iter(images), None)
         if primary:
             request = self.context.get('request')
             if request:
@@ -143,60 +282,46 @@ class SportEventListSerializer(serializers.ModelSerializer):
     
     def get_distance(self, obj):
         """
-        Távolság számítása a felhasználó pozíciójától (ha meg van adva)
-        Haversine formula használatával
+        Távolság a felhasználó pozíciójától (ha meg van adva)
+        Lista esetén a 'distance' értéket a lista nézet SQL annotációja
+        vagy a SportEventListListSerializer kötegelt számítása adja
         """
-        request = self.context.get('request')
-        if not request or not request.query_params.get('user_lat') or not request.query_params.get('user_lng'):
-            return None
-        
-        try:
-            user_lat = float(request.query_params.get('user_lat'))
-            user_lng = float(request.query_params.get('user_lng'))
-            
-            R = 6371 
-            
-            lat1 = radians(user_lat)
-            lon1 = radians(user_lng)
-            lat2 = radians(float(obj.latitude))
-            lon2 = radians(float(obj.longitude))
-            
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            distance = R * c
-            
-            return round(distance, 2)
-        except (ValueError, TypeError):
-            return None
-        
-    def get_status(self, obj):
-        if getattr(obj, 'status', None) == 'cancelled':
-            return 'cancelled'
-            
-        now = timezone.now()
-        duration = getattr(obj, 'duration_minutes', 60) or 60
-        end_time = obj.start_date_time + timedelta(minutes=duration)
+        distance = getattr(obj, 'distance', None)
+        if distance is None:
+            location = _request_location(self.context.get('request'))
+            if location is None:
+                return None
+            distance = haversine_many(location[0], location[1], [obj.latitude], [obj.longitude])[0]
+
+        return round(float(distance), 2)
 
-        if now < obj.start_date_time:
-            return 'upcoming'
-        elif obj.start_date_time <= now <= end_time:
-            return 'ongoing'
-        else:
-            return 'completed'
 
+# A normalizált válaszok 'included' részének forrásai
+EVENT_INCLUDES = (
+    ('sport_types', 'sport_type_id', load_sport_types),
+    ('users', 'creator_id', load_users),
+)
+PARTICIPANT_INCLUDES = (
+    ('users', 'user_id', load_users),
+)
 
-class SportEventDetailSerializer(serializers.ModelSerializer):
+
+class SportEventDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Esemény részletes megjelenítése
     """
-    sport_type_detail = SportTypeSerializer(source='sport_type', read_only=True)
-    creator_detail = UserSerializer(source='creator', read_only=True)
+    expandable_fields = {
+        'creator': 'creator_detail',
+        'sport_type': 'sport_type_detail',
+        'images': 'images',
+        'participants': 'participants',
+    }
+
+    sport_type_detail = CatalogSportTypeField()
+    creator_detail = UserSummarySerializer(source='creator', read_only=True)
     participants = EventParticipantSerializer(many=True, read_only=True)
     images = EventImageSerializer(many=True, read_only=True)
-    status = serializers.SerializerMethodField()
+    status = serializers.ReadOnlyField(source='current_status')
     is_full = serializers.ReadOnlyField()
     available_spots = serializers.ReadOnlyField()
     is_past = serializers.ReadOnlyField()
@@ -256,21 +381,6 @@ class SportEventDetailSerializer(serializers.ModelSerializer):
                 }
         return None
     
-    def get_status(self, obj):
-        if getattr(obj, 'status', None) == 'cancelled':
-            return 'cancelled'
-            
-        now = timezone.now()
-        duration = getattr(obj, 'duration_minutes', 60) or 60
-        end_time = obj.start_date_time + timedelta(minutes=duration)
-
-        if now < obj.start_date_time:
-            return 'upcoming'
-        elif obj.start_date_time <= now <= end_time:
-            return 'ongoing'
-        else:
-            return 'completed'
-        
     def get_average_rating(self, obj):
         ratings = obj.participants.filter(status='confirmed', rating__isnull=False).values_list('rating', flat=True)
         if ratings:
@@ -363,25 +473,36 @@ class SportEventCreateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """Esemény frissítése és résztvevők automatikus jóváhagyása, ha szükséges"""
         old_requires_approval = instance.requires_approval
+        
+        if instance.status != 'cancelled' and validated_data.keys() & {'start_date_time', 'end_date_time', 'duration_minutes'}:
+            # átütemezéskor a státusz az új időpontokhoz igazodik (pl. újra közelgő)
+            for field in ('start_date_time', 'end_date_time', 'duration_minutes'):
+                if field in validated_data:
+                    setattr(instance, field, validated_data[field])
+            validated_data['status'] = instance.lifecycle_status()
 
         updated_instance = super().update(instance, validated_data)
         
         new_requires_approval = updated_instance.requires_approval
         
         if old_requires_approval and not new_requires_approval:
-            pending_participants = updated_instance.participants.filter(status='pending')
-            
-            for participant in pending_participants:
-                participant.status = 'confirmed'
-                participant.confirmed_at = timezone.now()
-                participant.save()
+            confirmed = updated_instance.participants.filter(status='pending').update(
+                status='confirmed',
+                confirmed_at=timezone.now()
+            )
+            if confirmed:
+                SportEvent.refresh_occupancy([updated_instance.pk])
+                EventParticipant.refresh_organizer_ratings([updated_instance.creator_id])
+                bump_events_version()
+                updated_instance.refresh_from_db(fields=['confirmed_count', 'confirmed_guests'])
                 
         return updated_instance
 
 
 class JoinEventSerializer(serializers.Serializer):
     """
-    Eseményhez csatlakozás serializer
+    Eseményhez csatlakozás serializer (csak a bemenet validálása, a
+    létszám- és állapotszabályokat a participation_service.join_event ellenőrzi)
     """
     notes = serializers.CharField(
         required=False, 
@@ -395,21 +516,6 @@ class JoinEventSerializer(serializers.Serializer):
         default=0,
         min_value=0
     )
-    
-    def validate(self, attrs):
-        event = self.context['event']
-        user = self.context['request'].user
-        extra_guests = attrs.get('extra_guests', 0)
-        
-        can_join, message = event.can_user_join(user)
-        if not can_join:
-            raise serializers.ValidationError(message)
-            
-        total_joining = 1 + extra_guests
-        if event.available_spots < total_joining:
-            raise serializers.ValidationError(f"Nincs elég hely! Már csak {event.available_spots} szabad hely maradt.")
-            
-        return attrs
 
 
 class EventParticipantUpdateSerializer(serializers.ModelSerializer):
@@ -1,3 +1,1154 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from accounts.catalog import invalidate_catalog, get_sport_types, get_sport_type_data, get_catalog_version
+from accounts.models import User, SportType, UserSportPreference
+from .geo import haversine_many, has_geography_column
+from .models import SportEvent, EventParticipant, EventImage, UserRecommendation, DEFAULT_EVENT_DURATION
+from .participation_service import join_event, JoinRejected
+from .response_cache import cache_stats, bump_events_version, get_events_version
+from .search import has_search_vector
+from .serializers import trigger_recommendation_notifications
+from .views import SportEventListCreateView
+from .recommendation_cache import get_cached_recommendations
+from .recommendation_service import (
+    get_recommended_events,
+    get_recommended_events_sql,
+    get_cached_recommended_events,
+    get_precomputed_recommended_events,
+)
 
-# Create your tests here.
+
+def create_event(creator, sport_type, start=None, **fields):
+    fields.setdefault('max_participants', 10)
+    return SportEvent.objects.create(
+        title=fields.pop('title', f'{sport_type.name} esemény'),
+        description='',
+        sport_type=sport_type,
+        creator=creator,
+        location_name=fields.pop('location_name', 'Helyszín'),
+        latitude=fields.pop('latitude', 47.497913),
+        longitude=fields.pop('longitude', 19.040236),
+        start_date_time=start or timezone.now() + timedelta(days=1),
+        **fields
+    )
+
+
+def reset_catalog():
+    """
+    A folyamatszintű sportág katalógus újraépítése a teszt adataiból, hogy
+    a lekérdezés számokba ne számítson bele (és ne egy korábbi teszté legyen)
+    """
+    invalidate_catalog()
+    get_sport_types()
+
+
+class RadiusFilterTests(TestCase):
+    """Sugár alapú szűrés a lista végponton"""
+
+    center = (47.497913, 19.040236)
+
+    @classmethod
+    def setUpTestData(cls):
+        sport = SportType.objects.create(name='Futás')
+        organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.near = create_event(organizer, sport, title='Közeli', latitude=47.507, longitude=19.045)
+        cls.middle = create_event(organizer, sport, title='Közepes', latitude=47.6, longitude=19.1)
+        cls.far = create_event(organizer, sport, title='Távoli', latitude=46.25, longitude=20.15)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_list(self, **params):
+        response = self.client.get('/api/events/', {
+            'user_lat': self.center[0], 'user_lng': self.center[1], **params
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_only_events_within_radius(self):
+        results = self.get_list(radius=20)
+        self.assertEqual({item['id'] for item in results}, {self.near.pk, self.middle.pk})
+
+    def test_distance_annotation(self):
+        results = self.get_list(radius=200, ordering='distance')
+        self.assertEqual([item['id'] for item in results], [self.near.pk, self.middle.pk, self.far.pk])
+
+        events = [self.near, self.middle, self.far]
+        expected = haversine_many(
+            *self.center, [event.latitude for event in events], [event.longitude for event in events]
+        )
+        for item, distance in zip(results, expected):
+            self.assertAlmostEqual(item['distance'], float(distance), delta=0.01)
+
+    def test_upcoming_list_sees_moved_event(self):
+        self.assertNotIn(self.far.pk, {item['id'] for item in self.get_list(radius=20, status='upcoming')})
+
+        # signal nélküli módosítás, amiről egy folyamatonkénti index nem tudna
+        SportEvent.objects.filter(pk=self.far.pk).update(latitude=47.5, longitude=19.05)
+        cache.clear()
+
+        self.assertIn(self.far.pk, {item['id'] for item in self.get_list(radius=20, status='upcoming')})
+
+    def test_without_coordinates_distance_is_empty(self):
+        response = self.client.get('/api/events/', {'ordering': 'distance'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertTrue(all(item['distance'] is None for item in response.data['results']))
+
+
+class EventClusterTests(TestCase):
+    """/api/events/clusters/ csempénkénti klaszterek"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        # 4-es zoomon a csempe 22,5°, a cella 5,625°: az első három egy cellába esik
+        create_event(cls.organizer, cls.football, latitude=47.5, longitude=19.0)
+        create_event(cls.organizer, cls.football, latitude=47.6, longitude=19.2)
+        create_event(cls.organizer, cls.tennis, latitude=47.4, longitude=19.1)
+        create_event(cls.organizer, cls.tennis, latitude=46.0, longitude=13.0)
+        create_event(cls.organizer, cls.tennis, latitude=47.5, longitude=19.0, is_public=False)
+        create_event(cls.organizer, cls.football, latitude=40.0, longitude=19.0)
+
+    def setUp(self):
+        cache.clear()
+
+    def get_clusters(self, bbox, zoom, **params):
+        response = self.client.get('/api/events/clusters/', {'bbox': bbox, 'zoom': zoom, **params})
+        self.assertEqual(response.status_code, 200)
+        return sorted(response.data['clusters'], key=lambda cluster: -cluster['count'])
+
+    def test_counts_and_sport_breakdown(self):
+        clusters = self.get_clusters('16,45,22,50', 4)
+
+        self.assertEqual([cluster['count'] for cluster in clusters], [3, 1])
+        self.assertEqual(clusters[0]['sport_types'], {str(self.football.pk): 2, str(self.tennis.pk): 1})
+        self.assertAlmostEqual(clusters[0]['latitude'], 47.5)
+        self.assertAlmostEqual(clusters[0]['longitude'], 19.1)
+        self.assertEqual(clusters[1]['sport_types'], {str(self.tennis.pk): 1})
+
+        filtered = self.get_clusters('16,45,22,50', 4, sport_type=self.football.pk)
+        self.assertEqual([cluster['count'] for cluster in filtered], [2])
+
+    def test_event_on_tile_boundary_counted_once(self):
+        # 2-es zoomon a csempe 90°: a (0, -90) pont négy csempe sarka
+        create_event(self.organizer, self.football, latitude=0, longitude=-90)
+
+        self.assertEqual(sum(c['count'] for c in self.get_clusters('-100,-10,-80,10', 2)), 1)
+        self.assertEqual(sum(c['count'] for c in self.get_clusters('-90,0,-80,10', 2)), 1)
+        self.assertEqual(self.get_clusters('-100,-10,-91,-1', 2), [])
+
+    def test_event_on_antimeridian_is_in_last_tile(self):
+        create_event(self.organizer, self.football, latitude=10, longitude=180)
+
+        clusters = self.get_clusters('170,0,180,20', 2)
+        self.assertEqual([cluster['count'] for cluster in clusters], [1])
+        self.assertAlmostEqual(clusters[0]['longitude'], 180)
+
+    def test_event_creation_invalidates_tiles(self):
+        self.assertEqual(self.get_clusters('16,45,22,50', 4)[0]['count'], 3)
+        with self.assertNumQueries(0):
+            self.get_clusters('16,45,22,50', 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_event(self.organizer, self.football, latitude=47.55, longitude=19.05)
+
+        self.assertEqual(self.get_clusters('16,45,22,50', 4)[0]['count'], 4)
+
+    def test_invalid_parameters(self):
+        for params in (
+            {'zoom': 4},
+            {'bbox': '16,45,22', 'zoom': 4},
+            {'bbox': '22,45,16,50', 'zoom': 4},
+            {'bbox': '16,45,22,50', 'zoom': 'x'},
+            {'bbox': '16,45,22,50'},
+            {'bbox': '-180,-90,180,90', 'zoom': 10},
+        ):
+            response = self.client.get('/api/events/clusters/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+
+class RecommendationNotificationTests(TestCase):
+    """Új esemény értesítései a sportágat kedvelő, közeli felhasználóknak"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.users = {}
+        # (név, szélesség, sugár, sportág, aktív): az esemény Budapest belvárosában lesz
+        for name, lat, radius, sport, active in (
+            ('near', 47.55, 10, cls.football, True),         # ~5,8 km
+            ('too_far', 47.60, 5, cls.football, True),       # ~11,4 km > 5
+            ('wide', 48.30, 100, cls.football, True),        # ~89 km
+            ('zero_near', 47.55, 0, cls.football, True),     # alapértelmezett sugárral
+            ('zero_far', 47.62, 0, cls.football, True),      # ~13,6 km > alapértelmezett
+            ('inactive', 47.50, 10, cls.football, False),
+            ('other_sport', 47.50, 10, cls.tennis, True),
+        ):
+            user = User.objects.create_user(
+                name, f'{name}@example.com', 'pass12345', is_active=active,
+                default_latitude=lat, default_longitude=19.040236, default_search_radius=radius
+            )
+            UserSportPreference.objects.create(user=user, sport_type=sport)
+            cls.users[name] = user
+        cls.users['no_preference'] = User.objects.create_user(
+            'no_preference', 'no_preference@example.com', 'pass12345',
+            default_latitude=47.50, default_longitude=19.040236
+        )
+        cls.users['no_location'] = User.objects.create_user('no_location', 'no_location@example.com', 'pass12345')
+        UserSportPreference.objects.create(user=cls.users['no_location'], sport_type=cls.football)
+        # a szervező is kedveli a sportágat és ott lakik
+        User.objects.filter(pk=cls.organizer.pk).update(default_latitude=47.497913, default_longitude=19.040236)
+        UserSportPreference.objects.create(user=cls.organizer, sport_type=cls.football)
+
+    def test_recipients(self):
+        event = create_event(self.organizer, self.football)
+
+        with mock.patch('events.serializers.notify_recommended_event') as notify:
+            trigger_recommendation_notifications(event)
+
+        recipients = {call.args[0].username for call in notify.call_args_list}
+        self.assertEqual(recipients, {'near', 'wide', 'zero_near'})
+        self.assertEqual(notify.call_count, 3)
+        self.assertTrue(all(call.args[1] == event for call in notify.call_args_list))
+
+    def test_event_without_location_notifies_nobody(self):
+        event = create_event(self.organizer, self.football)
+        event.latitude = None
+
+        with mock.patch('events.serializers.notify_recommended_event') as notify:
+            trigger_recommendation_notifications(event)
+        notify.assert_not_called()
+
+
+class OccupancyCounterTests(TestCase):
+    """A denormalizált létszám számlálók"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Foci')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.player = User.objects.create_user('player', 'player@example.com', 'pass12345')
+
+    def assertCounters(self, event, expected):
+        event.refresh_from_db()
+        self.assertEqual((event.confirmed_count, event.confirmed_guests), expected)
+
+    def test_counters_follow_confirm_cancel_delete(self):
+        event = create_event(self.organizer, self.sport, requires_approval=True)
+        participant = EventParticipant.objects.create(event=event, user=self.player, extra_guests=1)
+        self.assertCounters(event, (0, 0))
+
+        participant.status = 'confirmed'
+        participant.save()
+        self.assertCounters(event, (1, 1))
+
+        participant.extra_guests = 3
+        participant.save()
+        self.assertCounters(event, (1, 3))
+
+        participant.status = 'cancelled'
+        participant.save()
+        self.assertCounters(event, (0, 0))
+
+        participant.status = 'confirmed'
+        participant.save()
+        participant.delete()
+        self.assertCounters(event, (0, 0))
+
+    def test_repair_counters(self):
+        event = create_event(self.organizer, self.sport)
+        EventParticipant.objects.create(event=event, user=self.player, status='confirmed', rating=5, extra_guests=1)
+        SportEvent.objects.filter(pk=event.pk).update(confirmed_count=7, confirmed_guests=0)
+        User.objects.filter(pk=self.organizer.pk).update(organizer_rating_sum=0, organizer_rating_count=0)
+
+        out = StringIO()
+        call_command('repair_counters', '--dry-run', stdout=out)
+        self.assertIn(f'Esemény #{event.pk}: résztvevők 7 -> 1, vendégek 0 -> 1', out.getvalue())
+        self.assertIn(f'Felhasználó #{self.organizer.pk}: értékelés összeg 0 -> 5, darab 0 -> 1', out.getvalue())
+        self.assertCounters(event, (7, 0))
+
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('1 számláló javítva (esemény létszám)', out.getvalue())
+        self.assertCounters(event, (1, 1))
+        organizer = User.objects.get(pk=self.organizer.pk)
+        self.assertEqual((organizer.organizer_rating_sum, organizer.organizer_rating_count), (5, 1))
+
+        out = StringIO()
+        call_command('repair_counters', stdout=out)
+        self.assertIn('Nincs eltérés (esemény létszám)', out.getvalue())
+        self.assertIn('Nincs eltérés (szervezői értékelés)', out.getvalue())
+
+    def test_stale_instance_save_keeps_counters(self):
+        event = create_event(self.organizer, self.sport)
+        stale = SportEvent.objects.get(pk=event.pk)
+
+        EventParticipant.objects.create(event=event, user=self.player, status='confirmed', extra_guests=2)
+
+        stale.title = 'Átnevezett esemény'
+        stale.save()
+
+        event.refresh_from_db()
+        self.assertEqual(event.title, 'Átnevezett esemény')
+        self.assertEqual((event.confirmed_count, event.confirmed_guests), (1, 2))
+        self.assertIsNotNone(event.participants_changed_at)
+
+    def test_stale_instance_save_keeps_advanced_status(self):
+        event = create_event(self.organizer, self.sport)
+        stale = SportEvent.objects.get(pk=event.pk)
+        SportEvent.objects.filter(pk=event.pk).update(status='completed')
+
+        stale.save()
+        self.assertEqual(SportEvent.objects.get(pk=event.pk).status, 'completed')
+
+        stale.status = 'cancelled'
+        stale.save()
+        self.assertEqual(SportEvent.objects.get(pk=event.pk).status, 'cancelled')
+
+    def test_stale_user_save_keeps_organizer_rating(self):
+        stale = User.objects.get(pk=self.organizer.pk)
+        event = create_event(self.organizer, self.sport, start=timezone.now() - timedelta(days=1), status='completed')
+        EventParticipant.objects.create(event=event, user=self.player, status='confirmed', rating=4)
+
+        stale.bio = 'Szervező'
+        stale.save()
+
+        organizer = User.objects.get(pk=self.organizer.pk)
+        self.assertEqual(organizer.bio, 'Szervező')
+        self.assertEqual((organizer.organizer_rating_sum, organizer.organizer_rating_count), (4, 1))
+
+
+class JoinEventTests(TestCase):
+    """Jelentkezés létszámkorláttal (participation_service.join_event)"""
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Kosárlabda')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.players = [
+            User.objects.create_user(f'player{i}', f'player{i}@example.com', 'pass12345')
+            for i in range(3)
+        ]
+
+    def test_full_event_rejects_join(self):
+        event = create_event(self.organizer, self.sport, max_participants=2)
+        join_event(event.pk, self.players[0])
+        join_event(event.pk, self.players[1])
+
+        with self.assertRaisesMessage(JoinRejected, 'Az esemény betelt'):
+            join_event(event.pk, self.players[2])
+
+        event.refresh_from_db()
+        self.assertEqual(event.confirmed_count, 2)
+        self.assertFalse(EventParticipant.objects.filter(event=event, user=self.players[2]).exists())
+
+    def test_guests_must_fit(self):
+        event = create_event(self.organizer, self.sport, max_participants=3)
+        join_event(event.pk, self.players[0])
+
+        with self.assertRaisesMessage(JoinRejected, 'Már csak 2 szabad hely maradt'):
+            join_event(event.pk, self.players[1], extra_guests=2)
+
+        join_event(event.pk, self.players[1], extra_guests=1)
+        event.refresh_from_db()
+        self.assertEqual((event.confirmed_count, event.confirmed_guests, event.available_spots), (2, 1, 0))
+
+    def test_duplicate_and_rejoin_after_cancel(self):
+        event = create_event(self.organizer, self.sport, max_participants=2)
+        _, participant = join_event(event.pk, self.players[0])
+
+        with self.assertRaisesMessage(JoinRejected, 'Már jelentkeztél'):
+            join_event(event.pk, self.players[0])
+
+        participant.status = 'cancelled'
+        participant.save()
+        join_event(event.pk, self.players[0])
+        event.refresh_from_db()
+        self.assertEqual(event.confirmed_count, 1)
+        self.assertEqual(EventParticipant.objects.filter(event=event).count(), 1)
+
+    def test_join_endpoint_returns_400_when_full(self):
+        event = create_event(self.organizer, self.sport, max_participants=2)
+        join_event(event.pk, self.players[0])
+        join_event(event.pk, self.players[1])
+
+        self.client.force_authenticate(self.players[2])
+        response = self.client.post(f'/api/events/{event.pk}/join/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['Az esemény betelt']})
+
+
+class PrimaryImageTests(TestCase):
+    """Lista: eseményenként egy kép, egyetlen előtöltő lekérdezéssel"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Kosárlabda')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        start = timezone.now() + timedelta(days=1)
+        cls.with_primary = create_event(cls.organizer, cls.sport, start=start, title='Elsődleges')
+        cls.add_image(cls.with_primary, 'primary.jpg', hours_ago=5, is_primary=True)
+        cls.add_image(cls.with_primary, 'newer.jpg', hours_ago=1)
+        cls.without_primary = create_event(cls.organizer, cls.sport, start=start + timedelta(hours=1), title='Legfrissebb')
+        cls.add_image(cls.without_primary, 'old.jpg', hours_ago=5)
+        cls.add_image(cls.without_primary, 'newest.jpg', hours_ago=1)
+        cls.without_images = create_event(cls.organizer, cls.sport, start=start + timedelta(hours=2), title='Kép nélkül')
+
+    @staticmethod
+    def add_image(event, name, hours_ago, is_primary=False):
+        image = EventImage.objects.create(event=event, image=f'event_images/{name}', is_primary=is_primary)
+        EventImage.objects.filter(pk=image.pk).update(uploaded_at=timezone.now() - timedelta(hours=hours_ago))
+
+    def setUp(self):
+        cache.clear()
+        reset_catalog()
+
+    def list_images(self):
+        response = self.client.get('/api/events/')
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['id']: item['primary_image'] and item['primary_image'].rsplit('/', 1)[-1]
+            for item in response.data['results']
+        }
+
+    def test_primary_fallback_and_missing(self):
+        with self.assertNumQueries(3):
+            images = self.list_images()
+
+        self.assertEqual(images, {
+            self.with_primary.pk: 'primary.jpg',
+            self.without_primary.pk: 'newest.jpg',
+            self.without_images.pk: None,
+        })
+
+    def test_query_count_does_not_grow_with_events(self):
+        for i in range(5):
+            event = create_event(self.organizer, self.sport, title=f'Plusz {i}')
+            self.add_image(event, f'extra{i}.jpg', hours_ago=i)
+
+        with self.assertNumQueries(3):
+            images = self.list_images()
+        self.assertEqual(len(images), 8)
+
+
+class SparseFieldsTests(TestCase):
+    """?fields= és ?expand= az esemény végpontokon"""
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Kézilabda')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        for i in range(3):
+            event = create_event(cls.organizer, cls.sport, title=f'Meccs {i}')
+            EventImage.objects.create(event=event, image=f'event_images/{i}.jpg', is_primary=True)
+
+    def setUp(self):
+        cache.clear()
+        reset_catalog()
+
+    def get_list(self, **params):
+        response = self.client.get('/api/events/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_fields_trim_payload_and_queries(self):
+        # szám, események a szervezővel és létszámmal, elsődleges képek
+        with self.assertNumQueries(3):
+            full = self.get_list()
+        self.assertIn('creator_detail', full[0])
+        self.assertIn('primary_image', full[0])
+        self.assertNotIn('images', full[0])
+
+        # nincs JOIN és képek előtöltése sem
+        with self.assertNumQueries(2):
+            trimmed = self.get_list(fields='id,title')
+        self.assertEqual([set(item) for item in trimmed], [{'id', 'title'}] * 3)
+        self.assertEqual([item['id'] for item in trimmed], [item['id'] for item in full])
+
+    def test_images_are_opt_in(self):
+        with self.assertNumQueries(4):
+            expanded = self.get_list(expand='images')
+        self.assertEqual([len(item['images']) for item in expanded], [1, 1, 1])
+        self.assertIn('creator_detail', expanded[0])
+
+        expanded_only = self.get_list(fields='id', expand='images')
+        self.assertEqual(set(expanded_only[0]), {'id', 'images'})
+
+    def test_fields_on_detail(self):
+        event = SportEvent.objects.first()
+        self.client.force_authenticate(self.organizer)
+
+        response = self.client.get(f'/api/events/{event.pk}/', {'fields': 'id,title,status'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'title', 'status'})
+
+
+class NormalizedFormatTests(TestCase):
+    """?format=normalized: hivatkozások id szerint, az objektumok egyszer az 'included' részben"""
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'pass12345', first_name='Alíz')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'pass12345')
+        cls.player = User.objects.create_user(
+            'player', 'player@example.com', 'pass12345',
+            default_latitude=47.497913, default_longitude=19.040236
+        )
+        UserSportPreference.objects.create(user=cls.player, sport_type=cls.football)
+        UserSportPreference.objects.create(user=cls.player, sport_type=cls.tennis)
+        cls.events = [
+            create_event(creator, sport, title=f'{creator.username} {sport.name}')
+            for creator in (cls.alice, cls.bob)
+            for sport in (cls.football, cls.tennis)
+        ]
+        for event in cls.events[:3]:
+            EventParticipant.objects.create(event=event, user=cls.player, status='confirmed')
+        EventParticipant.objects.create(event=cls.events[0], user=cls.bob, status='confirmed')
+
+    def setUp(self):
+        cache.clear()
+        reset_catalog()
+        # PostgreSQL-en folyamatonként egyszeri oszlop ellenőrzés
+        has_geography_column(SportEvent)
+        self.client.force_authenticate(self.player)
+
+    def get_normalized(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, {'format': 'normalized'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], response.data['included']
+
+    def assertIncludedOnce(self, included, key, expected_ids):
+        ids = [item['id'] for item in included[key]]
+        self.assertEqual(sorted(ids), sorted(set(ids)))
+        self.assertEqual(set(ids), set(expected_ids))
+
+    def assertEventRecords(self, results, included):
+        self.assertTrue(results)
+        for record in results:
+            self.assertNotIn('creator_detail', record)
+            self.assertNotIn('sport_type_detail', record)
+        self.assertIncludedOnce(included, 'users', {record['creator'] for record in results})
+        self.assertIncludedOnce(included, 'sport_types', {record['sport_type'] for record in results})
+
+    def test_event_list(self):
+        # szám, események, elsődleges képek, szervezők
+        results, included = self.get_normalized('/api/events/', 4)
+
+        self.assertEqual(len(results), 4)
+        self.assertEventRecords(results, included)
+        self.assertEqual(set(included['users'][0]), {
+            'id', 'username', 'first_name', 'last_name', 'full_name', 'profile_picture', 'organizer_rating'
+        })
+
+    def test_my_participations(self):
+        results, included = self.get_normalized('/api/events/my-participations/', 4)
+
+        self.assertEqual({record['id'] for record in results}, {event.pk for event in self.events[:3]})
+        self.assertEventRecords(results, included)
+
+    def test_recommended(self):
+        results, included = self.get_normalized('/api/events/recommended/', 9)
+
+        self.assertEqual({record['id'] for record in results}, {self.events[3].pk})
+        self.assertEventRecords(results, included)
+
+    def test_participants(self):
+        self.client.force_authenticate(self.alice)
+        results, included = self.get_normalized(f'/api/events/{self.events[0].pk}/participants/', 5)
+
+        self.assertEqual({record['user'] for record in results}, {self.player.pk, self.bob.pk})
+        self.assertTrue(all('user_detail' not in record for record in results))
+        self.assertIncludedOnce(included, 'users', {self.player.pk, self.bob.pk})
+
+
+class EventListCacheTests(TestCase):
+    """Verziózott lista cache (response_cache)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Röplabda')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.event = create_event(cls.organizer, cls.sport)
+
+    def setUp(self):
+        cache.clear()
+
+    def list_ids(self):
+        response = self.client.get('/api/events/')
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_repeated_request_is_a_hit(self):
+        self.assertEqual(self.list_ids(), [self.event.pk])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.list_ids(), [self.event.pk])
+
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_event_change_invalidates(self):
+        self.list_ids()
+        with self.captureOnCommitCallbacks(execute=True):
+            created = create_event(self.organizer, self.sport, start=timezone.now() + timedelta(days=2))
+
+        self.assertEqual(self.list_ids(), [self.event.pk, created.pk])
+        self.assertEqual(cache_stats()['misses'], 2)
+
+    def test_only_organizer_summary_changes_invalidate(self):
+        def version_after(change):
+            before = get_events_version()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            return get_events_version() != before
+
+        organizer = User.objects.get(username='organizer')
+        self.assertFalse(version_after(
+            lambda: User.objects.create_user('newcomer', 'newcomer@example.com', 'pass12345')
+        ))
+        newcomer = User.objects.get(username='newcomer')
+        newcomer.first_name = 'Új'
+        self.assertFalse(version_after(newcomer.save))
+
+        organizer.bio = 'Csak a profilban látszik'
+        self.assertFalse(version_after(organizer.save))
+        self.assertFalse(version_after(lambda: organizer.save(update_fields=['last_login'])))
+
+        organizer.first_name = 'Szervező'
+        self.assertTrue(version_after(organizer.save))
+        self.assertFalse(version_after(organizer.save))
+
+    def test_response_built_during_change_is_not_stored_under_new_version(self):
+        original = SportEventListCreateView.filter_queryset
+
+        def filter_during_change(view, queryset):
+            # egy párhuzamos írás a válasz felépítése közben
+            bump_events_version()
+            return original(view, queryset)
+
+        with mock.patch.object(SportEventListCreateView, 'filter_queryset', filter_during_change):
+            self.list_ids()
+        self.list_ids()
+
+        self.assertEqual(cache_stats()['hits'], 0)
+
+
+class CursorPaginationTests(TestCase):
+    """Keyset lapozás (?pagination=cursor) az esemény listán"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Úszás')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        start = timezone.now() + timedelta(days=1)
+        cls.events = [
+            create_event(cls.organizer, cls.sport, start=start + timedelta(hours=i // 2))
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_are_stable_under_inserts(self):
+        first = self.client.get('/api/events/', {'pagination': 'cursor'}).data
+        self.assertNotIn('count', first)
+        self.assertEqual(len(first['results']), 20)
+
+        # az első oldal elé beszúrt esemény nem tolja el a következő oldalt
+        create_event(self.organizer, self.sport, start=timezone.now() + timedelta(hours=1))
+
+        second = self.client.get(first['next']).data
+        self.assertIsNone(second['next'])
+
+        ids = [item['id'] for item in first['results'] + second['results']]
+        self.assertEqual(ids, [event.pk for event in self.events])
+
+    def test_equal_start_times_ordered_by_id(self):
+        ids = []
+        url, params = '/api/events/', {'pagination': 'cursor'}
+        while url:
+            page = self.client.get(url, params).data
+            ids += [item['id'] for item in page['results']]
+            url, params = page['next'], None
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, sorted(ids))
+
+
+class ConditionalGetTests(TestCase):
+    """ETag / If-None-Match az esemény részletein és a /users/me/ végponton"""
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Tenisz')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.player = User.objects.create_user('player', 'player@example.com', 'pass12345')
+        cls.event = create_event(cls.organizer, cls.sport)
+
+    def assertRevalidates(self, url):
+        """304 az aktuális ETag-re; visszatér az ETag-gel"""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        return etag
+
+    def test_event_detail(self):
+        self.client.force_authenticate(self.player)
+        url = f'/api/events/{self.event.pk}/'
+        etag = self.assertRevalidates(url)
+
+        join_event(self.event.pk, self.player)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['participants_count'], 1)
+
+    def test_event_detail_after_participant_profile_change(self):
+        join_event(self.event.pk, self.player)
+        self.client.force_authenticate(self.organizer)
+        url = f'/api/events/{self.event.pk}/'
+        etag = self.assertRevalidates(url)
+
+        player = User.objects.get(pk=self.player.pk)
+        player.first_name = 'Játékos'
+        player.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Játékos')
+
+    def test_current_user(self):
+        self.client.force_authenticate(self.player)
+        etag = self.assertRevalidates('/api/users/me/')
+
+        UserSportPreference.objects.create(user=self.player, sport_type=self.sport)
+        self.client.force_authenticate(User.objects.get(pk=self.player.pk))
+
+        response = self.client.get('/api/users/me/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SportCatalogTests(TestCase):
+    """Folyamatszintű sportág katalógus és a /api/sports/?with_counts=true"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.chess = SportType.objects.create(name='Sakk')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        create_event(cls.organizer, cls.football)
+        create_event(cls.organizer, cls.football)
+        create_event(cls.organizer, cls.tennis)
+        create_event(cls.organizer, cls.tennis, is_public=False)
+        create_event(cls.organizer, cls.tennis, status='cancelled')
+        create_event(cls.organizer, cls.tennis, start=timezone.now() - timedelta(days=2), status='completed')
+
+    def setUp(self):
+        cache.clear()
+        reset_catalog()
+
+    def get_sports(self, **params):
+        response = self.client.get('/api/sports/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.data
+        return data['results'] if isinstance(data, dict) else data
+
+    def test_sport_type_save_refreshes_catalog(self):
+        self.assertEqual([item['name'] for item in self.get_sports()], ['Foci', 'Sakk', 'Tenisz'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SportType.objects.create(name='Úszás')
+            self.chess.name = 'Asztalitenisz'
+            self.chess.save()
+
+        self.assertEqual([item['name'] for item in self.get_sports()], ['Asztalitenisz', 'Foci', 'Tenisz', 'Úszás'])
+        response = self.client.get('/api/events/')
+        self.assertEqual(
+            {item['sport_type_detail']['name'] for item in response.data['results']},
+            {'Foci', 'Tenisz'}
+        )
+
+    def test_unknown_id_rebuilds_only_local_copy(self):
+        # egy másik folyamatban létrehozott sportág: itt még nincs signal
+        climbing = SportType.objects.create(name='Mászás')
+        version = get_catalog_version()
+
+        self.assertEqual(get_sport_type_data(climbing.pk)['name'], 'Mászás')
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_with_counts(self):
+        counts = {item['name']: item['upcoming_events_count'] for item in self.get_sports(with_counts='true')}
+        self.assertEqual(counts, {'Foci': 2, 'Tenisz': 1, 'Sakk': 0})
+        self.assertNotIn('upcoming_events_count', self.get_sports()[0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_event(self.organizer, self.chess)
+
+        counts = {item['name']: item['upcoming_events_count'] for item in self.get_sports(with_counts='true')}
+        self.assertEqual(counts, {'Foci': 2, 'Tenisz': 1, 'Sakk': 1})
+
+
+class EventStatusTests(TestCase):
+    """Tárolt státusz léptetése és a tényleges befejezés"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = SportType.objects.create(name='Kerékpár')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+
+    def test_advance_statuses(self):
+        now = timezone.now()
+        ended = create_event(self.organizer, self.sport, start=now - timedelta(hours=5))
+        running = create_event(self.organizer, self.sport, start=now - timedelta(hours=1), duration_minutes=120)
+        future = create_event(self.organizer, self.sport, start=now + timedelta(days=1))
+        cancelled = create_event(self.organizer, self.sport, start=now - timedelta(hours=5), status='cancelled')
+
+        self.assertEqual(SportEvent.advance_statuses(now), (1, 1))
+        statuses = dict(SportEvent.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {
+            ended.pk: 'completed',
+            running.pk: 'ongoing',
+            future.pk: 'upcoming',
+            cancelled.pk: 'cancelled',
+        })
+
+        self.assertEqual(SportEvent.advance_statuses(now), (0, 0))
+        self.assertEqual(SportEvent.advance_statuses(now + timedelta(hours=2)), (0, 1))
+        self.assertEqual(SportEvent.objects.get(pk=running.pk).status, 'completed')
+
+    def test_effective_end_time_follows_reschedule(self):
+        start = timezone.now() + timedelta(days=1)
+        event = create_event(self.organizer, self.sport, start=start, duration_minutes=90)
+        self.assertEqual(event.effective_end_time, start + timedelta(minutes=90))
+
+        event.start_date_time = start + timedelta(hours=2)
+        event.save(update_fields=['start_date_time'])
+        event.refresh_from_db()
+        self.assertEqual(event.effective_end_time, start + timedelta(hours=2, minutes=90))
+
+        event.duration_minutes = None
+        event.save()
+        event.refresh_from_db()
+        self.assertEqual(event.effective_end_time, start + timedelta(hours=2) + DEFAULT_EVENT_DURATION)
+
+    def test_reschedule_through_api(self):
+        event = create_event(self.organizer, self.sport, start=timezone.now() - timedelta(minutes=30))
+        SportEvent.advance_statuses()
+        self.assertEqual(SportEvent.objects.get(pk=event.pk).status, 'ongoing')
+
+        new_start = timezone.now() + timedelta(days=3)
+        client = APIClient()
+        client.force_authenticate(self.organizer)
+        response = client.patch(f'/api/events/{event.pk}/', {
+            'start_date_time': new_start.isoformat(),
+            'end_date_time': (new_start + timedelta(hours=1)).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        event.refresh_from_db()
+        self.assertEqual(event.effective_end_time, new_start + timedelta(hours=1))
+        self.assertEqual(event.status, 'upcoming')
+
+    def test_update_event_statuses_dry_run(self):
+        create_event(self.organizer, self.sport, start=timezone.now() - timedelta(hours=1))
+
+        call_command('update_event_statuses', '--dry-run', stdout=StringIO())
+        self.assertEqual(SportEvent.objects.get().status, 'upcoming')
+
+        call_command('update_event_statuses', stdout=StringIO())
+        self.assertEqual(SportEvent.objects.get().status, 'ongoing')
+
+
+class EventSearchTests(TestCase):
+    """?search= a lista végponton"""
+
+    @classmethod
+    def setUpTestData(cls):
+        sport = SportType.objects.create(name='Atlétika')
+        organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        start = timezone.now() + timedelta(days=1)
+        cls.in_description = create_event(organizer, sport, start=start, title='Esti edzés')
+        SportEvent.objects.filter(pk=cls.in_description.pk).update(description='Laza futás a rakparton')
+        cls.in_title = create_event(organizer, sport, start=start + timedelta(hours=1), title='Futás a szigeten')
+        cls.unrelated = create_event(organizer, sport, start=start + timedelta(hours=2), title='Úszóverseny')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, terms):
+        response = self.client.get('/api/events/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_ilike_fallback(self):
+        if has_search_vector(SportEvent):
+            self.skipTest('teljes szöveges keresés aktív')
+
+        self.assertEqual(self.search('futás'), [self.in_description.pk, self.in_title.pk])
+        self.assertEqual(self.search('SZIGET'), [self.in_title.pk])
+        self.assertEqual(self.search('rakpart futás'), [self.in_description.pk])
+
+    def test_full_text_ranks_title_first(self):
+        if not has_search_vector(SportEvent):
+            self.skipTest('nincs search_vector oszlop')
+
+        self.assertEqual(self.search('futás'), [self.in_title.pk, self.in_description.pk])
+
+
+class EventSuggestTests(TestCase):
+    """/api/events/suggest/ gépelés közbeni javaslatok"""
+
+    @classmethod
+    def setUpTestData(cls):
+        sport = SportType.objects.create(name='Futás')
+        organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        start = timezone.now() + timedelta(days=1)
+        create_event(organizer, sport, start=start, title='Futás a Margitszigeten', location_name='Népliget')
+        create_event(organizer, sport, start=start, title='Margitszigeti kör', location_name='Margitsziget')
+        create_event(organizer, sport, start=start, title='Margitszigeti kör', location_name='Margitsziget')
+        create_event(organizer, sport, start=start, title='Margitszigeti titkos', location_name='Margitsziget',
+                     is_public=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def suggest(self, q):
+        response = self.client.get('/api/events/suggest/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_prefix_matches_rank_first(self):
+        data = self.suggest('margit')
+
+        self.assertEqual(data['titles'], ['Margitszigeti kör', 'Futás a Margitszigeten'])
+        self.assertEqual([location['name'] for location in data['locations']], ['Margitsziget'])
+
+    def test_result_is_cached_per_normalized_prefix(self):
+        first = self.suggest('margit')
+
+        with self.assertNumQueries(0):
+            second = self.suggest('  MARGIT ')
+        self.assertEqual(second, first)
+
+    def test_short_prefix_returns_empty(self):
+        with self.assertNumQueries(0):
+            data = self.suggest('m')
+        self.assertEqual(data, {'locations': [], 'titles': []})
+
+
+class RecommendationScoringTests(TestCase):
+    """Az SQL-oldali és az előre számolt pontozás ugyanazt a rangsort adja, mint a Python referencia"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.running = SportType.objects.create(name='Futás')
+        cls.chess = SportType.objects.create(name='Sakk')
+
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.user = User.objects.create_user(
+            'player', 'player@example.com', 'pass12345',
+            default_latitude=47.497913, default_longitude=19.040236, default_search_radius=30
+        )
+        UserSportPreference.objects.create(user=cls.user, sport_type=cls.football, skill_level='intermediate', interest_level=8)
+        UserSportPreference.objects.create(user=cls.user, sport_type=cls.tennis, skill_level='beginner', interest_level=5)
+
+        now = timezone.now()
+        # múltbeli részvételek a futásban: csak előzmény alapján releváns sportág
+        for days, rating in ((10, 5), (20, None)):
+            past = cls.create_event(cls.running, now - timedelta(days=days), 'easy', 47.5, 19.05, status='completed')
+            EventParticipant.objects.create(event=past, user=cls.user, status='confirmed', rating=rating)
+
+        coordinates = [(47.50, 19.04), (47.55, 19.10), (47.40, 18.90), (47.70, 19.30), (48.50, 20.50)]
+        difficulties = ['easy', 'medium', 'hard']
+        for i in range(30):
+            sport = (cls.football, cls.tennis, cls.running, cls.chess)[i % 4]
+            lat, lng = coordinates[i % len(coordinates)]
+            event = cls.create_event(
+                sport, now + timedelta(days=1, hours=i), difficulties[i % 3], lat, lng,
+                max_participants=5
+            )
+            others = [
+                User.objects.create(username=f'p{i}_{j}', email=f'p{i}_{j}@example.com')
+                for j in range(i % 5)
+            ]
+            for other in others:
+                EventParticipant.objects.create(event=event, user=other, status='confirmed')
+
+        joined = SportEvent.objects.filter(sport_type=cls.football, status='upcoming').first()
+        EventParticipant.objects.create(event=joined, user=cls.user, status='pending')
+
+    @classmethod
+    def create_event(cls, sport, start, difficulty, lat, lng, status='upcoming', max_participants=10):
+        return SportEvent.objects.create(
+            title=f'{sport.name} {start:%m%d%H}',
+            sport_type=sport,
+            creator=cls.organizer,
+            location_name='Helyszín',
+            latitude=lat,
+            longitude=lng,
+            start_date_time=start,
+            difficulty=difficulty,
+            max_participants=max_participants,
+            status=status,
+        )
+
+    def assertSameRanking(self, user):
+        reference = get_recommended_events(user, max_results=20, queryset=SportEvent.objects.all())
+        sql = get_recommended_events_sql(user, max_results=20, queryset=SportEvent.objects.all())
+
+        self.assertEqual([event.pk for event, _, _ in sql], [event.pk for event, _, _ in reference])
+        for (_, sql_score, sql_distance), (_, score, distance) in zip(sql, reference):
+            self.assertAlmostEqual(sql_score, score, places=2)
+            if distance is None:
+                self.assertIsNone(sql_distance)
+            else:
+                self.assertAlmostEqual(sql_distance, distance, delta=0.1)
+        return reference
+
+    def test_ranking_with_location(self):
+        ranking = self.assertSameRanking(self.user)
+        self.assertTrue(ranking)
+        self.assertIn(self.running.pk, {event.sport_type_id for event, _, _ in ranking})
+
+    def test_ranking_without_location(self):
+        User.objects.filter(pk=self.user.pk).update(default_latitude=None, default_longitude=None)
+        self.user.refresh_from_db()
+        self.assertSameRanking(self.user)
+
+    def test_user_without_preferences(self):
+        newcomer = User.objects.create_user('newcomer', 'newcomer@example.com', 'pass12345')
+        self.assertSameRanking(newcomer)
+
+    def test_reference_sees_new_and_moved_events(self):
+        event = self.create_event(self.football, timezone.now() + timedelta(hours=3), 'medium', 47.5, 19.04)
+        self.assertIn(event.pk, [e.pk for e, _, _ in get_recommended_events(self.user, max_results=50)])
+
+        SportEvent.objects.filter(pk=event.pk).update(latitude=48.5, longitude=20.5)
+        self.assertNotIn(event.pk, [e.pk for e, _, _ in get_recommended_events(self.user, max_results=50)])
+
+    def assertSamePrecomputed(self, user):
+        live = get_recommended_events(user, max_results=20, queryset=SportEvent.objects.all())
+        precomputed = get_precomputed_recommended_events(user, max_results=20, queryset=SportEvent.objects.all())
+
+        self.assertTrue(precomputed)
+        self.assertEqual([event.pk for event, _, _ in precomputed], [event.pk for event, _, _ in live])
+        for (_, precomputed_score, _), (_, score, _) in zip(precomputed, live):
+            self.assertAlmostEqual(precomputed_score, score, places=2)
+
+    def test_precomputed_matches_live(self):
+        newcomer = User.objects.create_user('newcomer', 'newcomer@example.com', 'pass12345')
+        call_command('precompute_recommendations', stdout=StringIO())
+
+        self.assertSamePrecomputed(self.user)
+        self.assertSamePrecomputed(newcomer)
+
+    def test_precompute_purges_users_not_recomputed(self):
+        call_command('precompute_recommendations', stdout=StringIO())
+        self.assertTrue(UserRecommendation.objects.filter(user=self.user).exists())
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        call_command('precompute_recommendations', stdout=StringIO())
+
+        self.assertFalse(UserRecommendation.objects.filter(user=self.user).exists())
+        self.assertTrue(UserRecommendation.objects.exists())
+
+    def test_precompute_in_worker_processes(self):
+        call_command('precompute_recommendations', stdout=StringIO())
+        expected = list(UserRecommendation.objects.order_by('user_id', 'rank').values_list('user_id', 'event_id', 'score'))
+
+        # a teszt tranzakció kapcsolatát nem zárhatja le; a gyerek folyamatok nem használják
+        with mock.patch.object(connections, 'close_all'):
+            call_command('precompute_recommendations', workers=2, batch_size=3, stdout=StringIO())
+        self.assertEqual(
+            list(UserRecommendation.objects.order_by('user_id', 'rank').values_list('user_id', 'event_id', 'score')),
+            expected
+        )
+
+    def test_precomputed_discarded_after_new_event(self):
+        call_command('precompute_recommendations', stdout=StringIO())
+        self.assertIsNotNone(get_precomputed_recommended_events(self.user))
+
+        self.create_event(self.football, timezone.now() + timedelta(days=2), 'medium', 47.5, 19.04)
+        self.assertIsNone(get_precomputed_recommended_events(self.user))
+
+
+class RecommendationCacheTests(TestCase):
+    """A felhasználónkénti ajánlás cache érvénytelenítése"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.football = SportType.objects.create(name='Foci')
+        cls.tennis = SportType.objects.create(name='Tenisz')
+        cls.chess = SportType.objects.create(name='Sakk')
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pass12345')
+        cls.user = User.objects.create_user(
+            'player', 'player@example.com', 'pass12345',
+            default_latitude=47.497913, default_longitude=19.040236, default_search_radius=20
+        )
+        UserSportPreference.objects.create(user=cls.user, sport_type=cls.football, interest_level=8)
+        cls.match = create_event(cls.organizer, cls.football)
+        cls.tennis_event = create_event(cls.organizer, cls.tennis)
+
+    def setUp(self):
+        cache.clear()
+
+    def recommended_ids(self):
+        return [event.pk for event, _, _ in get_cached_recommended_events(self.user)]
+
+    def test_repeated_call_is_cache_hit(self):
+        first = self.recommended_ids()
+
+        # csak a rangsor eseményei és az elsődleges képeik
+        with self.assertNumQueries(2):
+            self.assertEqual(self.recommended_ids(), first)
+
+    def test_preference_change_invalidates(self):
+        self.assertEqual(self.recommended_ids(), [self.match.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserSportPreference.objects.create(user=self.user, sport_type=self.tennis, interest_level=9)
+
+        self.assertIsNone(get_cached_recommendations(self.user))
+        self.assertEqual(self.recommended_ids(), [self.tennis_event.pk, self.match.pk])
+
+    def test_event_creation_invalidates_relevant_sport_only(self):
+        self.recommended_ids()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            create_event(self.organizer, self.chess)
+        self.assertIsNotNone(get_cached_recommendations(self.user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_match = create_event(self.organizer, self.football)
+        self.assertIsNone(get_cached_recommendations(self.user))
+        self.assertIn(new_match.pk, self.recommended_ids())
@@ -1,6 +1,9 @@
 from django.urls import path
 from .views import (
     SportEventListCreateView,
+    EventClusterView,
+    EventSuggestView,
+    EventListCacheStatsView,
     SportEventDetailView,
     MyEventsView,
     MyParticipationsView,
@@ -20,6 +23,15 @@ urlpatterns = [
     path('', SportEventListCreateView.as_view(), name='event-list-create'),
     path('<int:pk>/', SportEventDetailView.as_view(), name='event-detail'),
     
+    # Térképes klaszterek
+    path('clusters/', EventClusterView.as_view(), name='event-clusters'),
+    
+    # Gépelés közbeni javaslatok
+    path('suggest/', EventSuggestView.as_view(), name='event-suggest'),
+    
+    # Lista cache statisztika
+    path('cache-stats/', EventListCacheStatsView.as_view(), name='event-list-cache-stats'),
+    
     # Saját események
     path('my-events/', MyEventsView.as_view(), name='my-events'),
     path('my-participations/', MyParticipationsView.as_view(), name='my-participations'),
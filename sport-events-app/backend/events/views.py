@@ -2,16 +2,24 @@ from rest_framework import generics, status, permissions, filters
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Q, Count, F
+from django.db.models import Q, Count, Max, F, Value, FloatField
 from django.db import models
-from datetime import timedelta
-from math import radians, sin, cos, sqrt, atan2
 from .models import SportEvent, EventParticipant, EventImage
+from .geo import filter_within_radius
+from .search import EventSearchFilter, suggest
+from .clustering import parse_bbox, get_clusters, MAX_ZOOM
 from notifications.models import Notification
 from notifications.services import notify_join_request, notify_participant_status_change
-from .recommendation_service import get_recommended_events
+from accounts.catalog import get_catalog_version
+from .recommendation_service import get_cached_recommended_events
+from .participation_service import join_event, JoinRejected
+from .renderers import NormalizedJSONRenderer, is_normalized
+from sport_events_backend.pagination import HybridPagination
+from sport_events_backend.conditional import ConditionalGetMixin, make_etag
+from .response_cache import list_cache_key, get_cached_list, set_cached_list, cache_stats
 from .serializers import (
     SportEventListSerializer,
     SportEventDetailSerializer,
@@ -20,7 +28,10 @@ from .serializers import (
     EventParticipantUpdateSerializer,
     JoinEventSerializer,
     EventRatingSerializer,
-    EventImageSerializer
+    EventImageSerializer,
+    build_included,
+    EVENT_INCLUDES,
+    PARTICIPANT_INCLUDES
 )
 
 
@@ -34,7 +45,119 @@ class IsEventCreatorOrReadOnly(permissions.BasePermission):
         return obj.creator == request.user
 
 
-class SportEventListCreateView(generics.ListCreateAPIView):
+def filter_visible_events(queryset, query_params):
+    """
+    Nyilvános, nem törölt események a lista nézet státusz és
+    időpont szűrőivel (status, start_date_from, start_date_to)
+    """
+    queryset = queryset.filter(is_public=True).exclude(status='cancelled')
+    
+    # a tényleges befejezés tárolt oszlop, így a "közelgő vagy folyamatban"
+    # egyetlen tartomány az (is_public, effective_end_time, start_date_time) indexen
+    status_param = query_params.get('status')
+    now = timezone.now()
+    
+    if status_param == 'completed':
+        queryset = queryset.filter(Q(status='completed') | Q(effective_end_time__lte=now))
+    elif status_param == 'upcoming':
+        queryset = queryset.filter(start_date_time__gt=now).exclude(status='completed')
+    elif status_param == 'ongoing':
+        queryset = queryset.filter(effective_end_time__gt=now, start_date_time__lte=now).exclude(status='completed')
+    elif not status_param:
+        queryset = queryset.filter(effective_end_time__gt=now).exclude(status='completed')
+    
+    start_date_from = query_params.get('start_date_from')
+    start_date_to = query_params.get('start_date_to')
+    
+    if start_date_from:
+        queryset = queryset.filter(start_date_time__gte=start_date_from)
+    if start_date_to:
+        queryset = queryset.filter(start_date_time__lte=start_date_to)
+    
+    return queryset
+
+
+def select_for_fields(queryset, request, serializer_class=SportEventListSerializer):
+    """
+    Csak azokat a join-okat, prefetch-eket és annotációkat adja hozzá,
+    amiket a ?fields / ?expand szerint kiküldött mezők igényelnek
+    """
+    def wants(name):
+        return serializer_class.wants_field(request, name)
+
+    if any(wants(name) for name in ('participants_count', 'is_full', 'available_spots')):
+        queryset = queryset.with_occupancy()
+    if wants('primary_image'):
+        queryset = queryset.with_primary_image()
+
+    # a sportág adat a katalógusból jön, ahhoz nem kell JOIN
+    if wants('creator_detail'):
+        queryset = queryset.select_related('creator')
+
+    if wants('images'):
+        queryset = queryset.prefetch_related('images')
+    if wants('participants'):
+        queryset = queryset.prefetch_related(
+            models.Prefetch('participants', queryset=EventParticipant.objects.select_related('user'))
+        )
+    return queryset
+
+
+class NormalizedListMixin:
+    """
+    Lista nézetek opcionális normalizált formátuma (?format=normalized vagy
+    Accept: application/vnd.sportevents.normalized+json): az oldal elemei
+    mellé 'included' rész kerül az included_relations szerinti objektumokkal.
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NormalizedJSONRenderer]
+    included_relations = EVENT_INCLUDES
+
+    def get_included(self, objects):
+        return build_included(objects, self.included_relations, self.get_serializer_context())
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        self.page_objects = page
+        return page
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if is_normalized(self.request):
+            response.data['included'] = self.get_included(self.page_objects)
+        return response
+
+    def list_response(self, objects, data):
+        """Lapozás nélküli lista válasz"""
+        if is_normalized(self.request):
+            return Response({'results': data, 'included': self.get_included(objects)})
+        return Response(data)
+
+
+class EventPagination(HybridPagination):
+    """Keyset módban időpont szerint, az (start_date_time, id) indexen"""
+    cursor_ordering = ('start_date_time', 'id')
+
+
+class DistanceOrderingFilter(filters.OrderingFilter):
+    """
+    ?ordering=distance PostGIS esetén a 'knn_distance' (<->) annotációval
+    rendez, amit a GiST index közvetlenül ki tud szolgálni. Teljes szöveges
+    keresésnél explicit ?ordering nélkül relevancia szerint rendez.
+    """
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations and not request.query_params.get(self.ordering_param):
+            return ['-search_rank', *self.get_default_ordering(view)]
+        
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and 'knn_distance' in queryset.query.annotations:
+            ordering = [
+                field.replace('distance', 'knn_distance') if field.lstrip('-') == 'distance' else field
+                for field in ordering
+            ]
+        return ordering
+
+
+class SportEventListCreateView(NormalizedListMixin, generics.ListCreateAPIView):
     """
     Események listázása és létrehozása
     GET /api/events/
@@ -45,15 +168,18 @@ class SportEventListCreateView(generics.ListCreateAPIView):
     - status: szűrés státusz szerint
     - difficulty: szűrés nehézség szerint
     - is_free: ingyenes események (true/false)
-    - search: keresés címben, leírásban, helyszínben
-    - user_lat, user_lng, radius: távolság alapú szűrés
+    - search: keresés címben, leírásban, helyszínben (PostgreSQL-en teljes szöveges, relevancia szerint)
+    - user_lat, user_lng, radius: távolság alapú szűrés (SQL-ben, 'distance' annotációval)
+    - ordering: rendezés, pl. ordering=distance
     - start_date_from, start_date_to: időpont szűrés
+    - pagination=cursor / cursor: keyset lapozás (időpont szerint, COUNT nélkül)
     """
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = EventPagination
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, DistanceOrderingFilter]
     filterset_fields = ['sport_type', 'difficulty', 'is_free', 'creator']
     search_fields = ['title', 'description', 'location_name', 'location_address']
-    ordering_fields = ['start_date_time', 'created_at', 'max_participants']
+    ordering_fields = ['start_date_time', 'created_at', 'max_participants', 'distance']
     ordering = ['start_date_time']
     
     def get_serializer_class(self):
@@ -61,37 +187,25 @@ class SportEventListCreateView(generics.ListCreateAPIView):
             return SportEventCreateSerializer
         return SportEventListSerializer
     
-    def get_queryset(self):
-        queryset = SportEvent.objects.filter(is_public=True).exclude(status='cancelled').select_related(
-            'sport_type', 'creator'
-        ).prefetch_related('images', 'participants')
-        
-        status_param = self.request.query_params.get('status')
-        now = timezone.now()
-        
-        if status_param == 'upcoming':
-            queryset = queryset.filter(start_date_time__gt=now)
-            
-        elif status_param == 'ongoing':
-            queryset = queryset.filter(
-                Q(start_date_time__lte=now) & 
-                (Q(end_date_time__gt=now) | Q(end_date_time__isnull=True, start_date_time__gt=now - timedelta(hours=3)))
-            )
-            
-        elif not status_param:
-            queryset = queryset.filter(
-                Q(start_date_time__gt=now) | 
-                (Q(start_date_time__lte=now) & Q(end_date_time__gt=now)) |
-                (Q(start_date_time__lte=now) & Q(end_date_time__isnull=True, start_date_time__gt=now - timedelta(hours=3)))
-            )
-        
-        start_date_from = self.request.query_params.get('start_date_from')
-        start_date_to = self.request.query_params.get('start_date_to')
+    def list(self, request, *args, **kwargs):
+        # A lista válasz nem tartalmaz felhasználófüggő mezőt, így a
+        # normalizált paraméterekre és az events version-re kulcsolt cache
+        # minden felhasználót kiszolgálhat
+        key = list_cache_key(request)
+        data = get_cached_list(key)
+        if data is not None:
+            return Response(data)
         
-        if start_date_from:
-            queryset = queryset.filter(start_date_time__gte=start_date_from)
-        if start_date_to:
-            queryset = queryset.filter(start_date_time__lte=start_date_to)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            set_cached_list(key, response.data)
+        return response
+    
+    def get_queryset(self):
+        queryset = filter_visible_events(
+            select_for_fields(SportEvent.objects.all(), self.request),
+            self.request.query_params
+        )
         
         user_lat = self.request.query_params.get('user_lat')
         user_lng = self.request.query_params.get('user_lng')
@@ -99,50 +213,120 @@ class SportEventListCreateView(generics.ListCreateAPIView):
         
         if user_lat and user_lng:
             try:
-                user_lat = float(user_lat)
-                user_lng = float(user_lng)
-                radius = float(radius)
-                
-                filtered_events = []
-                for event in queryset:
-                    distance = self.calculate_distance(
-                        user_lat, user_lng,
-                        float(event.latitude), float(event.longitude)
-                    )
-                    if distance <= radius:
-                        filtered_events.append(event.id)
-                
-                queryset = queryset.filter(id__in=filtered_events)
+                user_lat, user_lng, radius = float(user_lat), float(user_lng), float(radius)
+                return filter_within_radius(queryset, user_lat, user_lng, radius)
             except (ValueError, TypeError):
                 pass
         
-        return queryset
+        # A ?ordering=distance koordináták nélkül se okozzon hibát
+        return queryset.annotate(distance=Value(None, output_field=FloatField()))
+
+
+class EventClusterView(generics.GenericAPIView):
+    """
+    Térképes esemény klaszterek
+    GET /api/events/clusters/?bbox=min_lng,min_lat,max_lng,max_lat&zoom=12
     
-    def calculate_distance(self, lat1, lon1, lat2, lon2):
-        """
-        Haversine formula - távolság számítás két koordináta között (km-ben)
-        """
-        R = 6371 
-        
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
+    Ugyanazokkal a szűrőkkel, mint a lista nézet:
+    sport_type, difficulty, is_free, status, start_date_from, start_date_to
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['sport_type', 'difficulty', 'is_free']
+    
+    cache_key_params = ['sport_type', 'difficulty', 'is_free', 'status', 'start_date_from', 'start_date_to']
+    
+    def get_queryset(self):
+        return filter_visible_events(SportEvent.objects.all(), self.request.query_params)
+    
+    def get(self, request):
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox', ''))
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response({
+                'error': 'Érvényes bbox (min_lng,min_lat,max_lng,max_lat) és zoom megadása kötelező.'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
+        zoom = max(0, min(zoom, MAX_ZOOM))
+        filters_key = '&'.join(
+            f'{param}={request.query_params.get(param)}'
+            for param in self.cache_key_params
+            if request.query_params.get(param)
+        )
         
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
+        try:
+            clusters = get_clusters(self.filter_queryset(self.get_queryset()), bbox, zoom, filters_key)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return R * c
+        return Response({
+            'zoom': zoom,
+            'clusters': clusters
+        })
+
+
+class EventSuggestView(APIView):
+    """
+    Gépelés közbeni javaslatok helyszínekre (koordinátákkal) és címekre
+    GET /api/events/suggest/?q=...
+    
+    A lista végpont helyett pg_trgm indexeken fut, prefix cache-sel.
+    """
+    permission_classes = [AllowAny]
+    
+    def get(self, request):
+        queryset = SportEvent.objects.filter(is_public=True).exclude(status='cancelled')
+        return Response(suggest(queryset, request.query_params.get('q', '')))
+
+
+class EventListCacheStatsView(APIView):
+    """
+    Az esemény lista cache találati statisztikája (csak adminoknak)
+    GET /api/events/cache-stats/
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request):
+        return Response(cache_stats())
 
 
-class SportEventDetailView(generics.RetrieveUpdateDestroyAPIView):
+class SportEventDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Esemény részletes megtekintése, szerkesztése, törlése
     GET/PUT/PATCH/DELETE /api/events/{id}/
+    
+    GET feltételes: az ETag az esemény, a résztvevők (és profiljuk), a képek
+    és a szervező változás jelölőiből számolódik, egyetlen rövid lekérdezéssel.
     """
-    queryset = SportEvent.objects.all()
     permission_classes = [IsAuthenticated, IsEventCreatorOrReadOnly]
     
+    def get_validators(self, request, *args, **kwargs):
+        # a résztvevők beágyazott profilja is a válasz része
+        row = SportEvent.objects.filter(pk=kwargs['pk']).annotate(
+            participant_users_changed_at=Max('participants__user__updated_at')
+        ).values_list(
+            'updated_at', 'participants_changed_at', 'images_changed_at', 'creator__updated_at',
+            'participant_users_changed_at', 'start_date_time', 'effective_end_time'
+        ).first()
+        if row is None:
+            return None
+        
+        *markers, start, end = row
+        # a státusz és az is_past írás nélkül, a kezdés és a befejezés pillanatában változik
+        now = timezone.now()
+        phase_changed_at = end if now >= end else start if now >= start else None
+        
+        # a sportág adat a katalógusból jön, annak verziója is része az ETag-nek
+        etag = make_etag(
+            'event', kwargs['pk'], markers, phase_changed_at, get_catalog_version(),
+            self.representation_key(request)
+        )
+        return etag, max(marker for marker in markers + [phase_changed_at] if marker is not None)
+    
+    def get_queryset(self):
+        return select_for_fields(SportEvent.objects.all(), self.request, SportEventDetailSerializer)
+    
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
             return SportEventCreateSerializer
@@ -151,7 +335,7 @@ class SportEventDetailView(generics.RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         """Esemény törlése helyett státusz változtatás"""
         instance.status = 'cancelled'
-        instance.save()
+        instance.save(update_fields=['status', 'updated_at'])
 
 
 class MyEventsView(generics.ListAPIView):
@@ -163,12 +347,12 @@ class MyEventsView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return SportEvent.objects.filter(
+        return select_for_fields(SportEvent.objects.filter(
             creator=self.request.user,
-        ).select_related('sport_type', 'creator').prefetch_related('images', 'participants')
+        ), self.request)
 
 
-class MyParticipationsView(generics.ListAPIView):
+class MyParticipationsView(NormalizedListMixin, generics.ListAPIView):
     """
     Események, amikre jelentkeztem
     GET /api/events/my-participations/
@@ -182,9 +366,9 @@ class MyParticipationsView(generics.ListAPIView):
             status__in=['pending', 'confirmed']
         ).values_list('event_id', flat=True)
         
-        return SportEvent.objects.filter(
+        return select_for_fields(SportEvent.objects.filter(
             id__in=participated_event_ids,
-        ).select_related('sport_type', 'creator').prefetch_related('images', 'participants')
+        ), self.request)
 
 
 class JoinEventView(APIView):
@@ -195,48 +379,32 @@ class JoinEventView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, pk):
+        serializer = JoinEventSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        notes = serializer.validated_data.get('notes', '')
+        extra_guests = serializer.validated_data.get('extra_guests', 0)
+
         try:
-            event = SportEvent.objects.get(pk=pk)
+            event, participant = join_event(pk, request.user, notes=notes, extra_guests=extra_guests)
         except SportEvent.DoesNotExist:
             return Response({'error': 'Az esemény nem található.'}, status=status.HTTP_404_NOT_FOUND)
+        except JoinRejected as exc:
+            return Response({'non_field_errors': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
 
-        serializer = JoinEventSerializer(
-            data=request.data,
-            context={'request': request, 'event': event}
-        )
-
-        if serializer.is_valid():
-            notes = serializer.validated_data.get('notes', '')
-            extra_guests = serializer.validated_data.get('extra_guests', 0)
-            
-            initial_status = 'pending' if event.requires_approval else 'confirmed'
-
-            participant, created = EventParticipant.objects.update_or_create(
+        if event.requires_approval:
+            notify_join_request(
                 event=event,
-                user=request.user,
-                defaults={
-                    'status': initial_status,
-                    'notes': notes,
-                    'extra_guests': extra_guests,
-                    'joined_at': timezone.now(),
-                    'confirmed_at': timezone.now() if initial_status == 'confirmed' else None
-                }
+                participant_user=request.user,
+                notes=notes,
+                extra_guests=extra_guests
             )
 
-            if event.requires_approval:
-                notify_join_request(
-                    event=event,
-                    participant_user=request.user,
-                    notes=notes,
-                    extra_guests=extra_guests
-                )
-
-            return Response({
-                'message': 'Sikeres jelentkezés!',
-                'participant': EventParticipantSerializer(participant).data
-            }, status=status.HTTP_201_CREATED)
-
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'message': 'Sikeres jelentkezés!',
+            'participant': EventParticipantSerializer(participant).data
+        }, status=status.HTTP_201_CREATED)
 
 class LeaveEventView(APIView):
     """
@@ -274,13 +442,14 @@ class LeaveEventView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class EventParticipantsView(generics.ListAPIView):
+class EventParticipantsView(NormalizedListMixin, generics.ListAPIView):
     """
     Esemény résztvevőinek listázása
     GET /api/events/{id}/participants/
     """
     serializer_class = EventParticipantSerializer
     permission_classes = [IsAuthenticated]
+    included_relations = PARTICIPANT_INCLUDES
     
     def get_queryset(self):
         event_id = self.kwargs['pk']
@@ -379,18 +548,21 @@ class EventImageUploadView(generics.CreateAPIView):
             }, status=status.HTTP_403_FORBIDDEN)
 
 
-class RecommendedEventsView(generics.ListAPIView):
+class RecommendedEventsView(NormalizedListMixin, generics.ListAPIView):
     """
     Ajánlott események a felhasználó preferenciái alapján
     GET /api/events/recommended/
+    
+    A rangsor felhasználónként cache-elt (recommendation_cache).
     """
     serializer_class = SportEventListSerializer
     permission_classes = [IsAuthenticated]
 
     def list(self, request, *args, **kwargs):
-        scored_events = get_recommended_events(
+        scored_events = get_cached_recommended_events(
             user=request.user,
-            max_results=20
+            max_results=20,
+            queryset=select_for_fields(SportEvent.objects.all(), request)
         )
 
         events = []
@@ -401,8 +573,9 @@ class RecommendedEventsView(generics.ListAPIView):
         
         data = serializer.data
         for i, (event, score, distance) in enumerate(scored_events):
-            data[i]['recommendation_score'] = score
-            if distance is not None:
+            if 'recommendation_score' in data[i]:
+                data[i]['recommendation_score'] = score
+            if distance is not None and 'distance' in data[i]:
                 data[i]['distance'] = distance
 
-        return Response(data)
\ No newline at end of file
+        return self.list_response(events, data)
\ No newline at end of file
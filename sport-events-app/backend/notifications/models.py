@@ -33,6 +33,9 @@ class Notification(models.Model):
         verbose_name = "Értesítés"
         verbose_name_plural = "Értesítések"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.recipient.username} - {self.title}"
\ No newline at end of file
@@ -2,6 +2,7 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from sport_events_backend.pagination import HybridPagination
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -10,9 +11,11 @@ class NotificationListView(generics.ListAPIView):
     """
     Saját értesítések listája
     GET /api/notifications/
+    GET /api/notifications/?pagination=cursor  (keyset lapozás, COUNT nélkül)
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = HybridPagination
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
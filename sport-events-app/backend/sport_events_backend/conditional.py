@@ -0,0 +1,49 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Gyenge ETag a megadott verzió jelölőkből (időbélyegek, számlálók, paraméterek)"""
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'W/{quote_etag(digest)}'
+
+
+class ConditionalGetMixin:
+    """
+    Feltételes GET: a get_validators() olcsón (szerializálás nélkül) adja az
+    ETag-et és a Last-Modified időpontot, egyező If-None-Match /
+    If-Modified-Since esetén 304 megy vissza, mielőtt a serializer lefutna.
+    """
+    def get_validators(self, request, *args, **kwargs):
+        """(etag, last_modified datetime) vagy None, ha nincs mihez viszonyítani"""
+        return None
+
+    def representation_key(self, request):
+        """Ami a válasz alakját befolyásolja: felhasználó, paraméterek, formátum"""
+        renderer = getattr(request, 'accepted_renderer', None)
+        return (
+            request.user.pk if request.user.is_authenticated else None,
+            sorted(request.query_params.lists()),
+            getattr(renderer, 'format', None),
+        )
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators(request, *args, **kwargs)
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Authorization'])
+        return response
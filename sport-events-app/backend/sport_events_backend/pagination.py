@@ -0,0 +1,52 @@
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+
+
+class FixedCursorPagination(CursorPagination):
+    """
+    Keyset lapozás rögzített rendezéssel: a ?ordering paramétert figyelmen
+    kívül hagyja, hogy a kurzor mindig a hozzá tartozó összetett indexen fusson
+    """
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class HybridPagination(BasePagination):
+    """
+    Alapból a megszokott oldalszámos lapozás (count, next, previous, results).
+    ?pagination=cursor vagy ?cursor=... esetén keyset lapozás a cursor_ordering
+    szerint: nincs COUNT(*) és OFFSET, így a mély oldalak is ugyanolyan gyorsak.
+    """
+    cursor_ordering = ('-created_at', '-id')
+
+    def __init__(self):
+        self.page_paginator = PageNumberPagination()
+        self.cursor_paginator = FixedCursorPagination()
+        self.cursor_paginator.ordering = self.cursor_ordering
+        self.active = self.page_paginator
+
+    @staticmethod
+    def uses_cursor(request):
+        return 'cursor' in request.query_params or request.query_params.get('pagination') == 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.cursor_paginator if self.uses_cursor(request) else self.page_paginator
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_paginator.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.page_paginator.get_schema_operation_parameters(view)
+            + self.cursor_paginator.get_schema_operation_parameters(view)
+        )
+
+    def to_html(self):
+        return self.active.to_html()
+
+    @property
+    def display_page_controls(self):
+        return self.active.display_page_controls
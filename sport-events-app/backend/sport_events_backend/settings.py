@@ -87,6 +87,9 @@ TEMPLATES = [
 WSGI_APPLICATION = 'sport_events_backend.wsgi.application'
 
 # Database
+# PostGIS opcionális: ha a postgis kiterjesztés elérhető (pl. helyi
+# postgis/postgis docker konténer), a migrációk geography oszlopot és GiST
+# indexet hoznak létre, és a távolság alapú lekérdezések ST_DWithin-t használnak.
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',